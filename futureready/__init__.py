@@ -8,6 +8,7 @@ from futureready.core.knowledge_base import KnowledgeBase
 from futureready.core.models import (
     Document,
     DocumentMetadata,
+    DocumentHeader,
     AgentResponse,
     Alert,
     SearchQuery,
@@ -19,6 +20,7 @@ __all__ = [
     "KnowledgeBase",
     "Document",
     "DocumentMetadata",
+    "DocumentHeader",
     "AgentResponse",
     "Alert",
     "SearchQuery",
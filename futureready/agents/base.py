@@ -3,7 +3,9 @@ BaseAgent - 所有 Agent 的抽象基类
 定义了 Agent 的标准接口和行为
 """
 
+import hashlib
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
@@ -11,6 +13,10 @@ from futureready.core.models import AgentResponse, Alert, SearchQuery
 from futureready.core.knowledge_base import KnowledgeBase
 
 
+# 每个 Agent 缓存的查询结果数上限
+RESPONSE_CACHE_SIZE = 128
+
+
 class LLMProvider(ABC):
     """LLM 提供者抽象接口"""
     
@@ -44,6 +50,9 @@ class BaseAgent(ABC):
         self.llm = llm_provider
         self.config = config or {}
         
+        # 查询结果的 LRU 缓存 (键包含知识库版本号，知识库变化后自动失效)
+        self._response_cache: OrderedDict[str, AgentResponse] = OrderedDict()
+        
     @abstractmethod
     async def query(
         self, 
@@ -71,6 +80,25 @@ class BaseAgent(ABC):
         """
         return []
     
+    def _cache_key(self, question: str, context: Optional[Dict[str, Any]]) -> str:
+        """根据问题、上下文和知识库版本号计算缓存键"""
+        raw = f"{type(self).__name__}\x00{question}\x00{context!r}\x00{self.kb.version}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+    
+    def _get_cached_response(self, key: str) -> Optional[AgentResponse]:
+        """读取缓存的查询结果"""
+        response = self._response_cache.get(key)
+        if response is not None:
+            self._response_cache.move_to_end(key)
+        return response
+    
+    def _cache_response(self, key: str, response: AgentResponse) -> None:
+        """缓存查询结果，超出上限时淘汰最久未使用的条目"""
+        self._response_cache[key] = response
+        self._response_cache.move_to_end(key)
+        if len(self._response_cache) > RESPONSE_CACHE_SIZE:
+            self._response_cache.popitem(last=False)
+    
     def _format_docs(self, documents: List[Any]) -> str:
         """格式化文档用于提示词"""
         formatted = []
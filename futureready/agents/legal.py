@@ -26,7 +26,23 @@ class LegalAgent(BaseAgent):
         question: str, 
         context: Optional[Dict[str, Any]] = None
     ) -> AgentResponse:
-        """回答法务相关问题"""
+        """回答法务相关问题 (相同问题在知识库未变化时直接返回缓存结果)"""
+        
+        cache_key = self._cache_key(question, context)
+        cached = self._get_cached_response(cache_key)
+        if cached is not None:
+            return cached
+        
+        response = await self._answer(question, context)
+        self._cache_response(cache_key, response)
+        return response
+    
+    async def _answer(
+        self, 
+        question: str, 
+        context: Optional[Dict[str, Any]] = None
+    ) -> AgentResponse:
+        """检索文档并生成答案"""
         
         # 1. 构建搜索查询
         search_query = SearchQuery(
@@ -167,32 +183,23 @@ class LegalAgent(BaseAgent):
         """监控合同到期"""
         alerts = []
         
-        # 获取所有有到期时间的合同
-        search_query = SearchQuery(
-            query="",
+        # 检查即将到期的合同 (未来60天内)，直接使用知识库的到期时间索引，
+        # 无需加载合同文档
+        now = datetime.now()
+        sixty_days_later = now + timedelta(days=60)
+        expiring_soon = self.kb.list_expiring(
+            now,
+            sixty_days_later,
             department="legal",
-            tags=["contract"],
-            limit=1000
+            tags=["contract"]
         )
         
-        contracts = await self.kb.search(search_query)
-        
-        # 检查即将到期的合同 (未来60天内)
-        sixty_days_later = datetime.now() + timedelta(days=60)
-        expiring_soon = []
-        
-        for result in contracts:
-            doc = result.document
-            if doc.metadata.expiry_date:
-                if datetime.now() <= doc.metadata.expiry_date <= sixty_days_later:
-                    expiring_soon.append(doc)
-        
         if expiring_soon:
             alerts.append(Alert(
                 type="contract_expiry",
                 severity=AlertSeverity.HIGH,
                 message=f"有 {len(expiring_soon)} 份合同将在未来60天内到期，请及时处理续约或终止事宜。",
-                affected_doc_ids=[d.id for d in expiring_soon],
+                affected_doc_ids=expiring_soon,
                 metadata={
                     "expiring_count": len(expiring_soon),
                     "period_days": 60
@@ -0,0 +1,112 @@
+"""
+文档关系图
+字符串文档ID映射为连续的 uint32 编号，关系以 CSR 邻接数组存储
+"""
+
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+
+class IdInterner:
+    """字符串ID <-> 连续整数编号 (uint32)"""
+
+    def __init__(self):
+        self._index: Dict[str, int] = {}
+        self._ids: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._index
+
+    def intern(self, doc_id: str) -> int:
+        """返回ID的编号，首次出现时分配新编号"""
+        idx = self._index.get(doc_id)
+        if idx is None:
+            idx = self._index[doc_id] = len(self._ids)
+            self._ids.append(doc_id)
+        return idx
+
+    def intern_many(self, doc_ids: Iterable[str]) -> np.ndarray:
+        """批量编号，返回 uint32 数组"""
+        return np.fromiter((self.intern(doc_id) for doc_id in doc_ids), dtype=np.uint32)
+
+    def get(self, doc_id: str) -> Optional[int]:
+        """查询已有编号 (不分配)"""
+        return self._index.get(doc_id)
+
+    def id_of(self, idx: int) -> str:
+        """编号 -> 字符串ID"""
+        return self._ids[idx]
+
+    def ids_of(self, indices: Iterable[int]) -> List[str]:
+        """批量编号 -> 字符串ID"""
+        return [self._ids[idx] for idx in indices]
+
+
+class AdjacencyCSR:
+    """
+    压缩稀疏行 (CSR) 邻接表
+
+    节点 i 的邻居为 indices[indptr[i]:indptr[i + 1]]，无需逐个对象扫描列表
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray):
+        self.indptr = indptr
+        self.indices = indices
+
+    @classmethod
+    def from_edges(
+        cls, num_nodes: int, src: np.ndarray, dst: np.ndarray
+    ) -> "AdjacencyCSR":
+        """由边列表 (src[k] -> dst[k]) 构建"""
+        order = np.argsort(src, kind="stable")
+        counts = np.bincount(src, minlength=num_nodes)
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return cls(indptr, dst[order].astype(np.uint32))
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.indptr) - 1
+
+    def neighbors(self, node: int) -> np.ndarray:
+        """节点的出边邻居"""
+        return self.indices[self.indptr[node] : self.indptr[node + 1]]
+
+    def transpose(self) -> "AdjacencyCSR":
+        """反向图 (入边变出边)"""
+        src = np.repeat(
+            np.arange(self.num_nodes, dtype=np.uint32), np.diff(self.indptr)
+        )
+        return AdjacencyCSR.from_edges(self.num_nodes, self.indices, src)
+
+
+def build_graph(
+    edges: Mapping[str, Iterable[str]], interner: Optional[IdInterner] = None
+) -> Tuple[IdInterner, AdjacencyCSR]:
+    """
+    由 {文档ID: 关联文档ID列表} 构建关系图
+
+    Args:
+        edges: 每个文档指向的文档ID
+        interner: 复用已有的编号表 (可选)
+
+    Returns:
+        Tuple[IdInterner, AdjacencyCSR]: 编号表与邻接表
+    """
+    interner = interner or IdInterner()
+    src: List[int] = []
+    dst: List[int] = []
+    for doc_id, targets in edges.items():
+        source = interner.intern(doc_id)
+        for target in targets:
+            src.append(source)
+            dst.append(interner.intern(target))
+
+    graph = AdjacencyCSR.from_edges(
+        len(interner), np.array(src, dtype=np.uint32), np.array(dst, dtype=np.uint32)
+    )
+    return interner, graph
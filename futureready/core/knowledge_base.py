@@ -4,17 +4,220 @@ KnowledgeBase - 核心知识库类
 """
 
 import os
+import re
 import json
+import math
+import asyncio
 import hashlib
+import heapq
+import logging
+import shutil
+import sqlite3
+import threading
+import weakref
+from collections import Counter, OrderedDict
+from itertools import islice
+from bisect import bisect_left, bisect_right, insort
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import (
+    List, Optional, Dict, Any, Set, FrozenSet, Iterable, Tuple, Collection
+)
 from datetime import datetime
 
+import numpy as np
+
+from futureready.core.graph import IdInterner, AdjacencyCSR, build_graph
 from futureready.core.models import (
-    Document, DocumentMetadata, DocumentType, 
-    SearchQuery, SearchResult, Entity
+    Document, DocumentMetadata, DocumentType, DocumentHeader,
+    SearchQuery, SearchResult, Entity, BatchClock, current_time, to_epoch_us, map_file
 )
 
+try:
+    import orjson  # 可选依赖，序列化速度快数倍且原生支持 datetime
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+
+logger = logging.getLogger(__name__)
+
+
+# 自上次保存倒排索引后更新的文档数超过该值 (且超过文档总数) 时重新保存
+INVERTED_SAVE_THRESHOLD = 1000
+
+# 大于任何文档ID，用于在 (时间, 文档ID) 有序列表中做闭区间二分
+_MAX_DOC_ID = "\U0010ffff"
+
+# 同时在线程池中读取/解析的文档数上限
+MAX_CONCURRENT_PARSE = 8
+
+# BM25 参数
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# 内存中缓存的已加载文档数量 (LRU)
+DOC_CACHE_SIZE = 256
+
+# 列式索引中用位图表示的高频标签数量 (uint64)，其余标签走稀疏表
+TAG_BITSET_SIZE = 64
+
+
+def _json_default(obj: Any) -> Any:
+    """标准库 json 的 datetime 序列化 (与 orjson 输出一致)"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _dumps(obj: Any, indent: bool = False) -> bytes:
+    """序列化为 UTF-8 JSON，优先使用 orjson"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(
+        obj, ensure_ascii=False, indent=2 if indent else None, default=_json_default
+    ).encode('utf-8')
+
+
+def _loads(data: bytes) -> Any:
+    """反序列化 JSON，优先使用 orjson"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _write_files(writes: List[Tuple[Path, bytes]]) -> None:
+    """依次写入多个文件 (在线程池中调用)"""
+    for path, data in writes:
+        with open(path, 'wb') as f:
+            f.write(data)
+
+
+def _query_time_us(value: Any) -> int:
+    """查询中的时间 (datetime 或 Unix 微秒) 统一换算为微秒"""
+    return value if isinstance(value, int) else to_epoch_us(value)
+
+
+class _IndexColumns:
+    """
+    索引的列式 (SoA) 视图
+    
+    按上传时间排序的并行 NumPy 数组 (上传时间、部门编号、标签位图)，
+    时间过滤是 searchsorted 切片，部门/标签过滤是向量化比较。
+    """
+    
+    def __init__(
+        self,
+        index: Dict[str, Any],
+        timeline: List[Tuple[int, str]],
+        doc_tag_ids: Dict[str, FrozenSet[int]],
+        tag_vocab: Dict[str, int]
+    ):
+        doc_ids = [doc_id for _, doc_id in timeline]
+        self.tag_vocab = tag_vocab
+        
+        self.doc_ids = np.array(doc_ids, dtype=object)
+        self.upload_us = np.array([us for us, _ in timeline], dtype=np.int64)
+        
+        # 文档类型对应的位 (1 << DocumentType.code)，与查询的类型掩码做位与
+        self.type_bit = np.array(
+            [1 << index[doc_id]["type_code"] for doc_id in doc_ids], dtype=np.uint64
+        )
+        
+        # 部门编号
+        self.dept_codes: Dict[Optional[str], int] = {}
+        self.dept_id = np.array(
+            [
+                self.dept_codes.setdefault(index[doc_id].get("department"), len(self.dept_codes))
+                for doc_id in doc_ids
+            ],
+            dtype=np.int32
+        )
+        
+        # 出现最多的标签占用位图中的一位，其余标签记录所在行号 (均按标签编号)
+        tag_counts = Counter(
+            tag_id for doc_id in doc_ids for tag_id in doc_tag_ids[doc_id]
+        )
+        self.tag_bit: Dict[int, int] = {
+            tag_id: bit
+            for bit, (tag_id, _) in enumerate(tag_counts.most_common(TAG_BITSET_SIZE))
+        }
+        tag_bitset = []
+        overflow_rows: Dict[int, List[int]] = {}
+        for row, doc_id in enumerate(doc_ids):
+            bits = 0
+            for tag_id in doc_tag_ids[doc_id]:
+                if tag_id in self.tag_bit:
+                    bits |= 1 << self.tag_bit[tag_id]
+                else:
+                    overflow_rows.setdefault(tag_id, []).append(row)
+            tag_bitset.append(bits)
+        self.tag_bitset = np.array(tag_bitset, dtype=np.uint64)
+        self.overflow_rows = {
+            tag_id: np.array(rows, dtype=np.int64) for tag_id, rows in overflow_rows.items()
+        }
+    
+    def select(self, query: SearchQuery) -> Optional[np.ndarray]:
+        """
+        按部门/标签/类型/时间条件筛选文档ID (按上传时间排序)
+        查询没有这些条件时返回 None
+        
+        时间条件可以是 Unix 微秒整数 (0 也是有效时间)，按是否为 None 判断
+        """
+        if not (
+            query.department or query.tags or query.doc_types
+            or query.date_range is not None or query.as_of_date is not None
+        ):
+            return None
+        
+        # 时间范围 (两端闭区间) 与时间旅行查询 (跳过在指定时间后上传的文档)
+        # 合并为一个时间窗口，每个边界只换算、二分一次
+        lo_us, hi_us = None, None
+        if query.date_range is not None:
+            lo_us = _query_time_us(query.date_range[0])
+            hi_us = _query_time_us(query.date_range[1])
+        if query.as_of_date is not None:
+            as_of_us = _query_time_us(query.as_of_date)
+            hi_us = as_of_us if hi_us is None else min(hi_us, as_of_us)
+        
+        lo, hi = 0, len(self.doc_ids)
+        if lo_us is not None:
+            lo = int(np.searchsorted(self.upload_us, lo_us, side="left"))
+        if hi_us is not None:
+            hi = int(np.searchsorted(self.upload_us, hi_us, side="right"))
+        
+        if lo >= hi:
+            return self.doc_ids[:0]
+        
+        mask = np.ones(hi - lo, dtype=bool)
+        
+        # 过滤部门
+        if query.department:
+            code = self.dept_codes.get(query.department)
+            if code is None:
+                return self.doc_ids[:0]
+            mask &= self.dept_id[lo:hi] == code
+        
+        # 过滤文档类型
+        if query.doc_types:
+            mask &= (self.type_bit[lo:hi] & np.uint64(query.doc_type_mask)) != 0
+        
+        # 过滤标签 (命中任一标签即可)
+        if query.tags:
+            tag_mask = np.zeros(hi - lo, dtype=bool)
+            query_bits = 0
+            for tag in query.tags:
+                tag_id = self.tag_vocab.get(tag)
+                if tag_id in self.tag_bit:
+                    query_bits |= 1 << self.tag_bit[tag_id]
+                elif tag_id in self.overflow_rows:
+                    rows = self.overflow_rows[tag_id]
+                    rows = rows[(rows >= lo) & (rows < hi)]
+                    tag_mask[rows - lo] = True
+            if query_bits:
+                tag_mask |= (self.tag_bitset[lo:hi] & np.uint64(query_bits)) != 0
+            mask &= tag_mask
+        
+        return self.doc_ids[lo:hi][mask]
+
 
 class KnowledgeBase:
     """
@@ -46,14 +249,75 @@ class KnowledgeBase:
         for path in [self.docs_path, self.metadata_path, self.index_path]:
             path.mkdir(parents=True, exist_ok=True)
         
-        # 加载索引
+        # 加载索引 (SQLite, WAL 模式)。知识库可能在一个线程中创建、在另一个线程的
+        # 事件循环中使用 (如 uvicorn 工作线程)，连接允许跨线程，访问由锁串行化
+        self._db = sqlite3.connect(self.index_path / "kb.sqlite", check_same_thread=False)
+        self._db_lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " doc_id TEXT PRIMARY KEY,"
+            " seq INTEGER NOT NULL,"  # 单调递增的写入序号
+            " entry BLOB NOT NULL"    # 索引条目 (JSON)
+            ")"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_documents_seq ON documents(seq)")
+        self._pending_ids: Dict[str, None] = {}  # 尚未写入数据库的文档ID (有序)
+        self._seq = 0
         self.index = self._load_index()
+        
+        # 内容版本号: 索引每次变化时递增，供上层缓存判断结果是否过期
+        self._kb_version = 0
+        
+        # 按上传时间排序的时间线，及其列式视图 (索引变化后按需重建)
+        self._timeline: List[Tuple[int, str]] = sorted(
+            (doc_info["upload_time_us"], doc_id)
+            for doc_id, doc_info in self.index.items()
+        )
+        self._columns: Optional[_IndexColumns] = None
+        
+        # 文档关联的反向图 (被引用文档 -> 引用它的文档)，索引变化后按需重建
+        self._reverse_graph: Optional[Tuple[IdInterner, AdjacencyCSR]] = None
+        
+        # 按到期时间排序的时间线 (仅包含设置了 expiry_date 的文档)
+        self._expiry_timeline: List[Tuple[int, str]] = sorted(
+            (doc_info["expiry_us"], doc_id)
+            for doc_id, doc_info in self.index.items()
+            if doc_info["expiry_us"] is not None
+        )
+        
+        # 标签字符串 -> 整数编号，过滤时只比较整数
+        self._tag_vocab: Dict[str, int] = {}
+        self._doc_tag_ids: Dict[str, FrozenSet[int]] = {
+            doc_id: self._intern_tags(doc_info.get("tags", []))
+            for doc_id, doc_info in self.index.items()
+        }
+        
+        # 加载倒排索引: 业务上下文和标签的词项 -> 文档ID集合，
+        # 以及 parsed_text 的词频 (词项 -> {文档ID: 词频})，同时用于正文候选和 BM25 打分
+        self._inverted: Dict[str, Set[str]] = {}
+        self._text_postings: Dict[str, Dict[str, int]] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        self._total_text_length = 0
+        self._inverted_dirty = False
+        self._inverted_seq = 0  # 已保存的倒排索引覆盖到的写入序号
+        self._load_inverted()
+        
+        # 已加载文档的 LRU 缓存 (按版本号校验是否过期)
+        self._doc_cache: OrderedDict[str, Document] = OrderedDict()
+        
+        # 限制并发读取/解析 (信号量绑定事件循环，每个事件循环各建一个)
+        self._parse_semaphores: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, asyncio.Semaphore
+        ] = weakref.WeakKeyDictionary()
     
     async def ingest(
         self, 
         file_path: str,
         metadata: Dict[str, Any],
-        parse_content: bool = True
+        parse_content: bool = True,
+        defer_index_flush: bool = False
     ) -> Document:
         """
         摄入新文档
@@ -62,6 +326,8 @@ class KnowledgeBase:
             file_path: 文档文件路径
             metadata: 元数据字典
             parse_content: 是否解析文档内容
+            defer_index_flush: 暂不将索引写盘 (批量摄入时使用，
+                结束后需调用 flush_index)
             
         Returns:
             Document: 创建的文档对象
@@ -73,7 +339,7 @@ class KnowledgeBase:
         # 2. 创建元数据对象
         doc_metadata = DocumentMetadata(
             uploader_id=metadata["uploader"],
-            upload_time=datetime.now(),
+            upload_time=current_time(),
             department=metadata.get("department", self.department),
             business_context=metadata["business_context"],
             tags=metadata.get("tags", []),
@@ -92,14 +358,16 @@ class KnowledgeBase:
         ext = Path(file_path).suffix.lower()
         content_type = self._get_content_type(ext)
         
-        # 5. 读取文件内容
-        with open(file_path, 'rb') as f:
-            raw_content = f.read()
-        
-        # 6. 解析内容 (可选)
-        parsed_text = None
-        if parse_content:
-            parsed_text = await self._parse_document(raw_content, content_type)
+        # 5. 复制原始文件到存储目录 & 6. 解析内容 (可选)
+        # 均在线程池中执行，避免阻塞事件循环，并发摄入时可以重叠 I/O；
+        # 原始内容不读入 Python 对象，解析时内存映射存储的副本
+        doc_file_path = self.docs_path / f"{doc_id}.bin"
+        async with self._get_parse_semaphore():
+            await asyncio.to_thread(shutil.copyfile, file_path, doc_file_path)
+            
+            parsed_text = None
+            if parse_content:
+                parsed_text = await self._parse_document(doc_file_path, content_type)
         
         # 7. 创建文档对象
         document = Document(
@@ -107,22 +375,129 @@ class KnowledgeBase:
             file_path=str(Path(file_path).name),
             content_type=content_type,
             metadata=doc_metadata,
-            raw_content=raw_content,
-            parsed_text=parsed_text
+            parsed_text=parsed_text,
+            content_path=str(doc_file_path)
         )
         
         # 8. 保存文档
-        self._save_document(document)
+        await self._save_document(document)
         
         # 9. 更新索引
-        self._update_index(document)
+        self._update_index(document, flush=not defer_index_flush)
         
-        print(f"✅ 文档已摄入: {doc_id}")
-        print(f"   部门: {doc_metadata.department}")
-        print(f"   上下文: {doc_metadata.business_context}")
+        logger.info(
+            "文档已摄入: %s (部门: %s, 上下文: %s)",
+            doc_id, doc_metadata.department, doc_metadata.business_context
+        )
         
         return document
     
+    async def ingest_batch(
+        self,
+        items: List[Tuple[str, Dict[str, Any]]],
+        parse_content: bool = True
+    ) -> List[Document]:
+        """
+        批量摄入文档，所有文档处理完后只写一次索引
+        
+        Args:
+            items: (文档文件路径, 元数据字典) 列表
+            parse_content: 是否解析文档内容
+            
+        Returns:
+            List[Document]: 创建的文档对象 (与 items 顺序一致)
+            
+        Raises:
+            部分文档失败时，等所有文档处理完并将成功的文档落盘后，
+            抛出第一个失败文档的异常
+        """
+        try:
+            # 同一批文档共用一个时间戳 (各任务创建时复制上下文)；
+            # 等待全部完成，不因单个失败而提前返回
+            with BatchClock():
+                tasks = [
+                    self.ingest(
+                        file_path,
+                        metadata,
+                        parse_content=parse_content,
+                        defer_index_flush=True
+                    )
+                    for file_path, metadata in items
+                ]
+                results = await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            # 部分文档失败时，已摄入的文档同样需要落盘
+            self.flush_index()
+        
+        documents = []
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+            documents.append(result)
+        return documents
+    
+    @property
+    def version(self) -> int:
+        """内容版本号 (只读)，索引每次变化时递增"""
+        return self._kb_version
+    
+    def flush_index(self) -> None:
+        """
+        将内存中尚未落盘的索引变更写入数据库
+        每次只写变更的条目，所有条目在同一个事务中提交
+        """
+        if not self._pending_ids:
+            return
+        
+        self._write_entries(self.index, self._pending_ids)
+        self._pending_ids.clear()
+        
+        # 倒排索引可以由索引重建，只需定期保存以加快启动
+        if (
+            not self._inverted_dirty
+            and self._seq - self._inverted_seq > max(INVERTED_SAVE_THRESHOLD, len(self.index))
+        ):
+            self._save_inverted()
+    
+    def list_expiring(
+        self,
+        start: datetime,
+        end: datetime,
+        department: Optional[str] = None,
+        tags: Optional[List[str]] = None
+    ) -> List[str]:
+        """
+        列出在指定时间段内到期的文档 (按到期时间排序)
+        
+        Args:
+            start: 起始时间 (含)
+            end: 结束时间 (含)
+            department: 只返回该部门的文档 (可选)
+            tags: 只返回包含任一标签的文档 (可选)
+            
+        Returns:
+            List[str]: 文档ID列表
+        """
+        lo = bisect_left(self._expiry_timeline, (to_epoch_us(start),))
+        hi = bisect_right(self._expiry_timeline, (to_epoch_us(end), _MAX_DOC_ID))
+        
+        doc_ids = []
+        for _, doc_id in self._expiry_timeline[lo:hi]:
+            doc_info = self.index[doc_id]
+            if department and doc_info.get("department") != department:
+                continue
+            if tags and not any(tag in doc_info.get("tags", []) for tag in tags):
+                continue
+            doc_ids.append(doc_id)
+        
+        return doc_ids
+    
+    def close(self) -> None:
+        """写入未落盘的索引并关闭数据库连接"""
+        self.flush_index()
+        with self._db_lock:
+            self._db.close()
+    
     async def search(self, query: SearchQuery) -> List[SearchResult]:
         """
         搜索文档
@@ -133,62 +508,97 @@ class KnowledgeBase:
         Returns:
             List[SearchResult]: 搜索结果列表
         """
-        results = []
+        terms = self._tokenize(query.query)
         
-        # 遍历所有文档
-        for doc_id, doc_info in self.index.items():
-            # 过滤部门
-            if query.department and doc_info.get("department") != query.department:
-                continue
-            
-            # 过滤标签
-            if query.tags:
-                doc_tags = set(doc_info.get("tags", []))
-                if not any(tag in doc_tags for tag in query.tags):
-                    continue
-            
-            # 过滤时间范围
-            if query.date_range:
-                upload_time = datetime.fromisoformat(doc_info["upload_time"])
-                if not (query.date_range[0] <= upload_time <= query.date_range[1]):
-                    continue
-            
-            # 时间旅行查询
-            if query.as_of_date:
-                upload_time = datetime.fromisoformat(doc_info["upload_time"])
-                if upload_time > query.as_of_date:
-                    continue  # 跳过在指定时间后上传的文档
-            
-            # 加载完整文档
-            doc = self._load_document(doc_id)
-            
-            # 基础文本匹配 (简单实现)
-            score = self._calculate_relevance_score(query.query, doc)
+        # 部门/标签/时间条件由列式索引过滤，查询词通过倒排索引缩小候选范围，
+        # 只遍历可能匹配的文档
+        candidates = self._candidate_ids(query, terms)
+        
+        if not query.query:
+            # 没有查询词时返回所有匹配的文档: 得分都是 1.0，稳定排序不会改变顺序，
+            # 无需逐个打分和排序，直接取前 limit 个
+            scored = [(doc_id, 1.0) for doc_id in islice(candidates, query.limit)]
+        else:
+            query_lower = query.query.lower()
+            ranked = []
+            for position, doc_id in enumerate(candidates):
+                doc_info = self.index[doc_id]
+                
+                # 基础文本匹配 (简单实现)，直接使用内存索引中的字段打分
+                text_score = self._text_score(query_lower, terms, doc_id)
+                score = self._calculate_relevance_score(query_lower, doc_info, text_score)
+                
+                if score > 0:
+                    ranked.append((-score, -(text_score or 0.0), position, doc_id, text_score))
             
-            if score > 0 or not query.query:  # 如果没有查询词，返回所有匹配的文档
-                results.append(SearchResult(
-                    document=doc,
-                    score=score,
-                    highlights=self._get_highlights(query.query, doc.parsed_text)
-                ))
+            scored = self._top_ranked(query_lower, ranked, query.limit)
         
-        # 按得分排序
-        results.sort(key=lambda x: x.score, reverse=True)
+        # 限制结果数量后才加载完整文档
+        results = []
+        for doc_id, score in scored:
+            doc = self._load_document(doc_id)
+            if not doc:
+                continue
+            results.append(SearchResult(
+                document=doc,
+                score=score,
+                highlights=self._get_highlights(query.query, doc.parsed_text)
+            ))
         
-        # 限制结果数量
-        return results[:query.limit]
+        return results
     
     async def get_document(self, doc_id: str) -> Optional[Document]:
-        """获取指定文档"""
+        """
+        获取指定文档
+        
+        返回的是缓存中的文档对象，与其他调用方 (包括 search 结果) 共享，
+        不应原地修改；更新元数据请使用 update_metadata
+        """
         return self._load_document(doc_id)
     
+    def find_referencing(self, doc_id: str) -> List[str]:
+        """列出在 related_doc_ids 中关联了指定文档的所有文档"""
+        if self._reverse_graph is None:
+            interner, graph = build_graph(
+                {
+                    source: doc_info["related_doc_ids"]
+                    for source, doc_info in self.index.items()
+                }
+            )
+            self._reverse_graph = (interner, graph.transpose())
+        
+        interner, reverse = self._reverse_graph
+        node = interner.get(doc_id)
+        if node is None:
+            return []
+        return interner.ids_of(reverse.neighbors(node))
+    
+    def get_header(self, doc_id: str) -> Optional[DocumentHeader]:
+        """获取文档头 (直接取自索引，不读取文档文件)"""
+        doc_info = self.index.get(doc_id)
+        if doc_info is None:
+            return None
+        
+        return DocumentHeader(
+            id=doc_id,
+            content_type=DocumentType.from_code(doc_info["type_code"]),
+            department=doc_info.get("department"),
+            upload_time_us=doc_info["upload_time_us"],
+            expiry_us=doc_info["expiry_us"]
+        )
+    
     async def update_metadata(
         self, 
         doc_id: str, 
         metadata_updates: Dict[str, Any]
     ) -> Document:
-        """更新文档元数据"""
-        doc = self._load_document(doc_id)
+        """
+        更新文档元数据
+        
+        在从磁盘重新读取的文档上修改 (不修改缓存中的共享对象)，
+        此前通过 get_document / search 返回的文档不受影响，保存失败也不会留下修改
+        """
+        doc = self._read_document(doc_id)
         if not doc:
             raise ValueError(f"文档不存在: {doc_id}")
         
@@ -203,7 +613,7 @@ class KnowledgeBase:
         doc.updated_at = datetime.now()
         doc.version += 1
         
-        self._save_document(doc)
+        await self._save_document(doc, include_content=False)
         self._update_index(doc)
         
         return doc
@@ -212,7 +622,8 @@ class KnowledgeBase:
         """生成文档唯一ID"""
         timestamp = datetime.now().isoformat()
         content = f"{file_path}{timestamp}"
-        return hashlib.sha256(content.encode()).hexdigest()[:16]
+        # BLAKE2b 直接输出 8 字节摘要 (16位十六进制)，无需截断，且比 SHA-256 更快
+        return hashlib.blake2b(content.encode(), digest_size=8).hexdigest()
     
     def _get_content_type(self, ext: str) -> DocumentType:
         """根据扩展名确定文档类型"""
@@ -231,26 +642,43 @@ class KnowledgeBase:
     
     async def _parse_document(
         self, 
-        content: bytes, 
+        file_path: Path, 
         content_type: DocumentType
     ) -> str:
+        """解析文档文件 (在线程池中执行)"""
+        return await asyncio.to_thread(self._parse_file, file_path, content_type)
+    
+    def _parse_file(self, file_path: Path, content_type: DocumentType) -> str:
+        """内存映射文件并解析，只有解析器实际访问的部分会被读入"""
+        return self._parse_content(map_file(str(file_path)), content_type)
+    
+    def _parse_content(self, content: memoryview, content_type: DocumentType) -> str:
         """
-        解析文档内容
+        解析文档内容的同步实现
         TODO: 实现真实的文档解析 (PDF/Word等)
         """
         if content_type == DocumentType.TXT:
-            return content.decode('utf-8', errors='ignore')
+            return str(content, 'utf-8', errors='ignore')
         else:
             # 其他格式暂时返回占位符
             # 实际使用需要集成 PyPDF2, python-docx 等库
             return f"[{content_type} 文档解析功能开发中]"
     
-    def _save_document(self, document: Document) -> None:
-        """保存文档到磁盘"""
-        # 保存原始文件
+    async def _save_document(self, document: Document, include_content: bool = True) -> None:
+        """
+        保存文档到磁盘 (文件写入在线程池中执行，不阻塞事件循环)
+        
+        Args:
+            document: 文档对象
+            include_content: 是否写入原始文件 (仅更新元数据时无需重写)
+        """
+        self._doc_cache.pop(document.id, None)
+        writes: List[Tuple[Path, bytes]] = []
+        
+        # 保存原始文件 (已在存储目录中的无需重写)
         doc_file_path = self.docs_path / f"{document.id}.bin"
-        with open(doc_file_path, 'wb') as f:
-            f.write(document.raw_content)
+        if include_content and document.content_path != str(doc_file_path):
+            writes.append((doc_file_path, document.raw_content))
         
         # 保存元数据
         metadata_file_path = self.metadata_path / f"{document.id}.json"
@@ -260,37 +688,55 @@ class KnowledgeBase:
             "content_type": document.content_type.value,
             "metadata": {
                 "uploader_id": document.metadata.uploader_id,
-                "upload_time": document.metadata.upload_time.isoformat(),
+                "upload_time": document.metadata.upload_time,
                 "department": document.metadata.department,
                 "business_context": document.metadata.business_context,
                 "tags": document.metadata.tags,
                 "related_doc_ids": document.metadata.related_doc_ids,
-                "expiry_date": document.metadata.expiry_date.isoformat() if document.metadata.expiry_date else None,
+                "expiry_date": document.metadata.expiry_date,
                 "source_url": document.metadata.source_url
             },
             "parsed_text": document.parsed_text,
-            "created_at": document.created_at.isoformat(),
-            "updated_at": document.updated_at.isoformat(),
+            "created_at": document.created_at,
+            "updated_at": document.updated_at,
             "version": document.version
         }
         
-        with open(metadata_file_path, 'w', encoding='utf-8') as f:
-            json.dump(metadata_dict, f, ensure_ascii=False, indent=2)
+        writes.append((metadata_file_path, _dumps(metadata_dict, indent=True)))
+        
+        # 同一文档的所有文件在一次线程切换中写完
+        await asyncio.to_thread(_write_files, writes)
     
     def _load_document(self, doc_id: str) -> Optional[Document]:
-        """从磁盘加载文档"""
+        """从磁盘加载文档 (优先返回版本一致的缓存)"""
+        cached = self._doc_cache.get(doc_id)
+        if cached is not None:
+            doc_info = self.index.get(doc_id)
+            if doc_info and doc_info.get("version") == cached.version:
+                self._doc_cache.move_to_end(doc_id)
+                return cached
+            del self._doc_cache[doc_id]
+        
+        document = self._read_document(doc_id)
+        if document is not None:
+            self._doc_cache[doc_id] = document
+            if len(self._doc_cache) > DOC_CACHE_SIZE:
+                self._doc_cache.popitem(last=False)
+        
+        return document
+    
+    def _read_document(self, doc_id: str) -> Optional[Document]:
+        """从磁盘读取并重建文档对象"""
         metadata_file_path = self.metadata_path / f"{doc_id}.json"
         
         if not metadata_file_path.exists():
             return None
         
-        with open(metadata_file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        with open(metadata_file_path, 'rb') as f:
+            data = _loads(f.read())
         
-        # 加载原始内容
+        # 原始内容延迟到首次访问 raw_content / open_content 时再读取
         doc_file_path = self.docs_path / f"{doc_id}.bin"
-        with open(doc_file_path, 'rb') as f:
-            raw_content = f.read()
         
         # 重建文档对象
         metadata = DocumentMetadata(
@@ -304,77 +750,444 @@ class KnowledgeBase:
             source_url=data["metadata"]["source_url"]
         )
         
-        return Document(
+        # 入库时已校验过，重建时跳过校验
+        return Document._from_trusted(
             id=data["id"],
             file_path=data["file_path"],
-            content_type=DocumentType(data["content_type"]),
+            content_type=DocumentType.lookup(data["content_type"]),
             metadata=metadata,
-            raw_content=raw_content,
             parsed_text=data.get("parsed_text"),
             created_at=datetime.fromisoformat(data["created_at"]),
             updated_at=datetime.fromisoformat(data["updated_at"]),
-            version=data["version"]
+            version=data["version"],
+            content_path=str(doc_file_path)
         )
     
     def _load_index(self) -> Dict[str, Any]:
-        """加载索引"""
+        """从数据库加载索引，数据库为空时迁移旧版 index.json"""
+        index = {}
+        for doc_id, seq, entry in self._db.execute(
+            "SELECT doc_id, seq, entry FROM documents"
+        ):
+            index[doc_id] = _loads(entry)
+            self._seq = max(self._seq, seq)
+        
+        if not index:
+            index = self._migrate_legacy_index()
+        
+        return index
+    
+    def _write_entries(self, index: Dict[str, Any], doc_ids: Iterable[str]) -> None:
+        """在同一个事务中写入索引条目，每个条目分配新的写入序号"""
+        rows = []
+        for doc_id in doc_ids:
+            self._seq += 1
+            rows.append((doc_id, self._seq, _dumps(index[doc_id])))
+        
+        with self._db_lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO documents (doc_id, seq, entry) VALUES (?, ?, ?)",
+                rows
+            )
+    
+    def _migrate_legacy_index(self) -> Dict[str, Any]:
+        """
+        迁移旧版 index.json: 其中每个条目只有 file_path / department / tags /
+        upload_time / business_context，其余字段由元数据文件补齐后写入数据库
+        """
         index_file = self.index_path / "index.json"
-        if index_file.exists():
-            with open(index_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {}
+        if not index_file.exists():
+            return {}
+        
+        with open(index_file, 'rb') as f:
+            index = _loads(f.read())
+        
+        for doc_id, doc_info in index.items():
+            data = {}
+            metadata_file_path = self.metadata_path / f"{doc_id}.json"
+            if metadata_file_path.exists():
+                with open(metadata_file_path, 'rb') as f:
+                    data = _loads(f.read())
+            metadata = data.get("metadata", {})
+            expiry_date = metadata.get("expiry_date")
+            
+            doc_info["upload_time_us"] = to_epoch_us(
+                datetime.fromisoformat(doc_info["upload_time"])
+            )
+            doc_info["expiry_us"] = (
+                to_epoch_us(datetime.fromisoformat(expiry_date)) if expiry_date else None
+            )
+            doc_info["type_code"] = DocumentType.lookup(
+                data.get("content_type", DocumentType.TXT.value)
+            ).code
+            doc_info["related_doc_ids"] = metadata.get("related_doc_ids", [])
+            doc_info["version"] = data.get("version")
+            doc_info["ctx_lower"] = (doc_info.get("business_context") or "").lower()
+            doc_info["tags_lower"] = [tag.lower() for tag in doc_info.get("tags", [])]
+        
+        # 写入数据库，下次启动直接从数据库加载
+        if index:
+            self._write_entries(index, list(index))
+        return index
     
-    def _update_index(self, document: Document) -> None:
+    def _update_index(self, document: Document, flush: bool = True) -> None:
         """更新索引"""
+        old_info = self.index.get(document.id)
+        if old_info:
+            self._discard_sorted(self._timeline, (old_info["upload_time_us"], document.id))
+            if old_info["expiry_us"] is not None:
+                self._discard_sorted(
+                    self._expiry_timeline, (old_info["expiry_us"], document.id)
+                )
+        
+        upload_time_us = document.metadata.upload_time_us
+        insort(self._timeline, (upload_time_us, document.id))
+        
+        expiry_us = document.metadata.expiry_date_us
+        if expiry_us is not None:
+            insort(self._expiry_timeline, (expiry_us, document.id))
+        
         self.index[document.id] = {
             "file_path": document.file_path,
             "department": document.metadata.department,
             "tags": document.metadata.tags,
             "upload_time": document.metadata.upload_time.isoformat(),
-            "business_context": document.metadata.business_context
+            "upload_time_us": upload_time_us,
+            "expiry_us": expiry_us,
+            "type_code": document.content_type.code,
+            "related_doc_ids": document.metadata.related_doc_ids,
+            "business_context": document.metadata.business_context,
+            "version": document.version,
+            # 预先转为小写，查询时无需逐个文档 lower()
+            "ctx_lower": (document.metadata.business_context or "").lower(),
+            "tags_lower": [tag.lower() for tag in document.metadata.tags]
         }
         
+        self._index_terms(document.id, self.index[document.id])
+        self._index_text(document.id, document.parsed_text)
+        self._doc_tag_ids[document.id] = self._intern_tags(document.metadata.tags)
+        self._pending_ids[document.id] = None
+        self._columns = None
+        self._reverse_graph = None
+        self._kb_version += 1
+        
         # 保存索引
-        index_file = self.index_path / "index.json"
-        with open(index_file, 'w', encoding='utf-8') as f:
-            json.dump(self.index, f, ensure_ascii=False, indent=2)
+        if flush:
+            self.flush_index()
+    
+    def _get_parse_semaphore(self) -> asyncio.Semaphore:
+        """当前事件循环的解析信号量"""
+        loop = asyncio.get_running_loop()
+        semaphore = self._parse_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._parse_semaphores[loop] = asyncio.Semaphore(MAX_CONCURRENT_PARSE)
+        return semaphore
     
-    def _calculate_relevance_score(self, query: str, document: Document) -> float:
+    def _discard_sorted(self, items: List[Tuple[int, str]], item: Tuple[int, str]) -> None:
+        """从有序列表中删除指定元素 (二分定位)"""
+        pos = bisect_left(items, item)
+        if pos < len(items) and items[pos] == item:
+            del items[pos]
+    
+    def _intern_tags(self, tags: Iterable[str]) -> FrozenSet[int]:
+        """将标签转换为整数编号 (首次出现的标签分配新编号)"""
+        return frozenset(
+            self._tag_vocab.setdefault(tag, len(self._tag_vocab)) for tag in tags
+        )
+    
+    def _tokenize(self, text: Optional[str]) -> Set[str]:
+        """
+        切分倒排索引词项 (小写字符 bigram)
+        
+        查询词是某字段的子串时，它的所有 bigram 必然出现在该字段中，
+        因此倒排索引只会多给候选，不会漏掉匹配文档，中英文均适用。
+        """
+        if not text:
+            return set()
+        
+        text = text.lower()
+        return {text[i:i + 2] for i in range(len(text) - 1)}
+    
+    def _term_counts(self, text: Optional[str]) -> Counter:
+        """统计词项 (与 _tokenize 相同的 bigram) 的词频"""
+        if not text:
+            return Counter()
+        
+        text = text.lower()
+        return Counter(text[i:i + 2] for i in range(len(text) - 1))
+    
+    def _index_terms(self, doc_id: str, doc_info: Dict[str, Any]) -> None:
+        """将文档的业务上下文和标签写入倒排索引"""
+        terms = self._tokenize(doc_info.get("business_context"))
+        for tag in doc_info.get("tags", []):
+            terms |= self._tokenize(tag)
+        
+        # 更新元数据时不清理旧词项: 过期的 posting 只会多给候选，
+        # 下次重建时自然消失
+        for term in terms:
+            self._inverted.setdefault(term, set()).add(doc_id)
+    
+    def _index_text(self, doc_id: str, parsed_text: Optional[str]) -> None:
+        """
+        记录正文的词频和文档长度 (BM25 打分用)
+        正文词项只存于 _text_postings，其键同时作为正文的倒排索引
+        """
+        text_counts = self._term_counts(parsed_text)
+        
+        # parsed_text 摄入后不再变化，重复索引时直接覆盖词频即可
+        for term, count in text_counts.items():
+            self._text_postings.setdefault(term, {})[doc_id] = count
+        
+        doc_length = sum(text_counts.values())
+        self._total_text_length += doc_length - self._doc_lengths.get(doc_id, 0)
+        self._doc_lengths[doc_id] = doc_length
+    
+    def _load_inverted(self) -> None:
+        """加载倒排索引，缺失或与主索引不一致时标记为需要重建"""
+        inverted_file = self.index_path / "inverted.json"
+        if not inverted_file.exists():
+            self._inverted_dirty = bool(self.index)
+            return
+        
+        with open(inverted_file, 'rb') as f:
+            data = _loads(f.read())
+        
+        self._inverted = {
+            term: set(doc_ids) for term, doc_ids in data["terms"].items()
+        }
+        self._text_postings = data["text_terms"]
+        self._doc_lengths = data["doc_lengths"]
+        self._total_text_length = sum(self._doc_lengths.values())
+        self._inverted_seq = data["seq"]
+        
+        # 补上保存之后新增或更新的文档 (正文不变，只有新增的文档需要读取正文)
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT doc_id FROM documents WHERE seq > ?", (self._inverted_seq,)
+            ).fetchall()
+        for (doc_id,) in rows:
+            self._index_terms(doc_id, self.index[doc_id])
+            if doc_id not in self._doc_lengths:
+                self._index_text(doc_id, self._read_parsed_text(doc_id))
+    
+    def _save_inverted(self) -> None:
+        """保存倒排索引"""
+        inverted_file = self.index_path / "inverted.json"
+        data = {
+            "seq": self._seq,
+            "terms": {
+                term: sorted(doc_ids) for term, doc_ids in self._inverted.items()
+            },
+            "text_terms": self._text_postings,
+            "doc_lengths": self._doc_lengths
+        }
+        tmp_file = self.index_path / "inverted.json.tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(_dumps(data))
+        os.replace(tmp_file, inverted_file)
+        self._inverted_seq = self._seq
+    
+    def _rebuild_inverted(self) -> None:
+        """从内存索引重建倒排索引 (仅在索引缺失或过期时触发)"""
+        self._inverted = {}
+        self._text_postings = {}
+        self._doc_lengths = {}
+        self._total_text_length = 0
+        for doc_id, doc_info in self.index.items():
+            self._index_terms(doc_id, doc_info)
+            self._index_text(doc_id, self._read_parsed_text(doc_id))
+        
+        self._inverted_dirty = False
+        self._save_inverted()
+    
+    def _filter_ids(self, query: SearchQuery) -> Optional[np.ndarray]:
+        """按部门/标签/时间条件筛选文档ID，没有这些条件时返回 None"""
+        if self._columns is None:
+            self._columns = _IndexColumns(
+                self.index, self._timeline, self._doc_tag_ids, self._tag_vocab
+            )
+        return self._columns.select(query)
+    
+    def _candidate_ids(self, query: SearchQuery, terms: Set[str]) -> Iterable[str]:
+        """
+        根据查询词项和过滤条件返回候选文档ID (按上传时间排序，保持结果稳定)
+        查询词过短无法切出 bigram 时，不做文本剪枝
+        """
+        window = self._filter_ids(query)
+        
+        if not terms:
+            if window is not None:
+                return window.tolist()
+            return [doc_id for _, doc_id in self._timeline]
+        
+        if self._inverted_dirty:
+            self._rebuild_inverted()
+        
+        # 业务上下文/标签与正文分别求交集: 查询词是某个字段的子串时，
+        # 它的所有词项都出现在该字段所在的一组 posting 中
+        empty: Dict[str, int] = {}
+        candidates = self._intersect(
+            [self._inverted.get(term, set()) for term in terms]
+        ) | self._intersect(
+            [self._text_postings.get(term, empty) for term in terms]
+        )
+        
+        if window is not None:
+            return [doc_id for doc_id in window if doc_id in candidates]
+        
+        return sorted(
+            (doc_id for doc_id in candidates if doc_id in self.index),
+            key=lambda doc_id: self.index[doc_id]["upload_time_us"]
+        )
+    
+    @staticmethod
+    def _intersect(postings: List[Collection[str]]) -> Set[str]:
+        """从最短的 posting 开始求交集 (posting 可以是文档ID集合或以文档ID为键的字典)"""
+        postings.sort(key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            if not result:
+                break
+            result = {doc_id for doc_id in result if doc_id in posting}
+        return result
+    
+    def _text_score(
+        self,
+        query_lower: str,
+        terms: Set[str],
+        doc_id: str
+    ) -> Optional[float]:
+        """
+        计算 parsed_text 的 BM25 得分 (基于摄入时预先统计的词频)
+        query_lower 为已转小写的查询词，正文不包含全部查询词项时返回 None
+        
+        返回值只表示可能命中，由 _top_ranked 读取正文确认
+        """
+        if not query_lower:
+            return None
+        
+        # 单字查询切不出 bigram，无法剪枝，每个文档都可能命中
+        if not terms:
+            return 0.0
+        
+        doc_length = self._doc_lengths.get(doc_id)
+        if not doc_length:
+            return None
+        
+        n_docs = len(self._doc_lengths)
+        avg_length = self._total_text_length / n_docs
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_length / avg_length)
+        
+        score = 0.0
+        for term in terms:
+            posting = self._text_postings.get(term)
+            if posting is None:
+                return None
+            tf = posting.get(doc_id)
+            if not tf:
+                return None
+            
+            idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            score += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        
+        return score
+    
+    def _top_ranked(
+        self,
+        query_lower: str,
+        ranked: List[Tuple[float, float, int, str, Optional[float]]],
+        limit: int
+    ) -> List[Tuple[str, float]]:
+        """
+        按得分取前 limit 个结果，得分相同时按正文 BM25 得分、再按候选顺序排列
+        
+        bigram 全部出现不代表查询词在正文中连续出现 (如 "abc" 与 "ab…bc")，
+        正文命中只在结果进入前 limit 时读取正文确认，未命中则去掉正文加分后重新排队
+        """
+        heapq.heapify(ranked)
+        
+        scored: List[Tuple[str, float]] = []
+        while ranked and len(scored) < limit:
+            neg_score, _, position, doc_id, text_score = heapq.heappop(ranked)
+            if text_score is not None and not self._text_contains(doc_id, query_lower):
+                score = self._calculate_relevance_score(query_lower, self.index[doc_id])
+                if score > 0:
+                    heapq.heappush(ranked, (-score, 0.0, position, doc_id, None))
+                continue
+            scored.append((doc_id, -neg_score))
+        
+        return scored
+    
+    def _read_parsed_text(self, doc_id: str) -> Optional[str]:
+        """读取文档正文 (优先使用缓存的文档，否则只解析元数据文件)"""
+        cached = self._doc_cache.get(doc_id)
+        if cached is not None:
+            return cached.parsed_text
+        
+        metadata_file_path = self.metadata_path / f"{doc_id}.json"
+        if not metadata_file_path.exists():
+            return None
+        with open(metadata_file_path, 'rb') as f:
+            return _loads(f.read()).get("parsed_text")
+    
+    def _text_contains(self, doc_id: str, query_lower: str) -> bool:
+        """读取文档正文，确认其中包含完整的查询词"""
+        doc = self._load_document(doc_id)
+        return bool(doc and doc.parsed_text and query_lower in doc.parsed_text.lower())
+    
+    def _calculate_relevance_score(
+        self,
+        query_lower: str,
+        doc_info: Dict[str, Any],
+        text_score: Optional[float] = None
+    ) -> float:
         """
         计算相关性得分 (简单实现)
+        query_lower 为已转小写的查询词 (在搜索循环外计算一次)，
+        text_score 为 _text_score 的结果，None 表示正文未命中
         TODO: 实现向量相似度计算
         """
-        if not query:
+        if not query_lower:
             return 1.0
         
-        query_lower = query.lower()
         score = 0.0
         
         # 检查业务上下文
-        if document.metadata.business_context and query_lower in document.metadata.business_context.lower():
+        if query_lower in doc_info["ctx_lower"]:
             score += 0.5
         
         # 检查标签
-        if any(query_lower in tag.lower() for tag in document.metadata.tags):
+        if any(query_lower in tag for tag in doc_info["tags_lower"]):
             score += 0.3
         
         # 检查解析的文本
-        if document.parsed_text and query_lower in document.parsed_text.lower():
+        if text_score is not None:
             score += 0.2
         
         return min(score, 1.0)
     
     def _get_highlights(self, query: str, text: Optional[str]) -> List[str]:
         """提取匹配片段"""
-        if not query or not text:
+        if not query or not text or '。' in query:
             return []
         
         # 简单实现: 找到包含查询词的句子
-        highlights = []
-        sentences = text.split('。')
+        # 直接定位匹配位置再按句号截取所在句子，不切分/复制全文
+        pattern = re.compile(re.escape(query), re.IGNORECASE)
+        highlights: List[str] = []
+        pos = 0
         
-        for sentence in sentences[:10]:  # 最多10个
-            if query.lower() in sentence.lower():
-                highlights.append(sentence.strip() + '。')
+        while len(highlights) < 10:  # 最多10个
+            match = pattern.search(text, pos)
+            if not match:
+                break
+            
+            start = text.rfind('。', 0, match.start()) + 1
+            end = text.find('。', match.end())
+            if end == -1:
+                end = len(text)
+            
+            highlights.append(text[start:end].strip() + '。')
+            pos = end + 1
         
         return highlights
@@ -3,13 +3,172 @@ FutureReady-KB 核心数据模型
 定义文档、实体、关系等核心数据结构
 """
 
-from dataclasses import dataclass, field
-from datetime import datetime
-from typing import List, Optional, Dict, Any
+import os
+import re
+import sys
+import mmap
+from contextvars import ContextVar
+from dataclasses import KW_ONLY, MISSING, InitVar, dataclass, field, fields
+from datetime import datetime, timedelta, timezone
+from typing import (
+    List, Optional, Dict, Any, Callable, ClassVar, Tuple, Iterable, TYPE_CHECKING
+)
 from enum import Enum
 
+import numpy as np
 
-class DocumentType(str, Enum):
+if TYPE_CHECKING:
+    import pandas as pd
+    from typing_extensions import Self  # Python 3.11 起为 typing.Self
+
+try:
+    import msgpack  # 可选依赖，to_msgpack/from_msgpack 使用
+except ImportError:
+    msgpack = None
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def to_epoch_us(value: datetime) -> int:
+    """
+    datetime -> Unix 时间戳 (整数微秒)
+    
+    naive datetime 按本地时间处理 (与 datetime.timestamp() 一致)，
+    整数运算，不经过浮点数
+    """
+    return (value.astimezone(timezone.utc) - _EPOCH) // _MICROSECOND
+
+
+def from_epoch_us(value: int) -> datetime:
+    """Unix 时间戳 (整数微秒) -> 本地时间的 naive datetime"""
+    return (_EPOCH + value * _MICROSECOND).astimezone().replace(tzinfo=None)
+
+
+# BatchClock 块内共用的"当前时间"
+_BATCH_NOW: ContextVar[Optional[datetime]] = ContextVar("_BATCH_NOW", default=None)
+
+
+class BatchClock:
+    """
+    批量创建对象时共用同一个当前时间
+    
+    块内创建的对象 (created_at/updated_at 等默认值) 使用进入块时的时间，
+    整批只读取一次系统时钟:
+        with BatchClock():
+            docs = [Document(...) for ...]
+    """
+    
+    def __enter__(self) -> "BatchClock":
+        self._token = _BATCH_NOW.set(datetime.now())
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        _BATCH_NOW.reset(self._token)
+
+
+def current_time() -> datetime:
+    """当前时间 (在 BatchClock 块内返回该批次的时间)"""
+    return _BATCH_NOW.get() or datetime.now()
+
+
+def _datetime_to_us(value: Optional[datetime]) -> Optional[int]:
+    return None if value is None else to_epoch_us(value)
+
+
+def _us_to_datetime(value: Optional[int]) -> Optional[datetime]:
+    return None if value is None else from_epoch_us(value)
+
+
+# 元数据校验 (模块加载时预编译)
+_EMAIL_RE = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+MIN_BUSINESS_CONTEXT_LENGTH = 10
+
+
+def _stripped_length(text: str) -> int:
+    """去掉首尾空白后的长度 (首尾不是空白时无需复制字符串)"""
+    if not text[0].isspace() and not text[-1].isspace():
+        return len(text)
+    return len(text.strip())
+
+
+def map_file(path: str) -> memoryview:
+    """
+    只读内存映射整个文件 (零拷贝，操作系统按需分页读入)
+    
+    返回的 memoryview 存活期间映射保持有效
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(b"")  # 空文件无法映射
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def _require_msgpack() -> None:
+    if msgpack is None:
+        raise ImportError("msgpack 序列化需要安装 msgpack: pip install msgpack")
+
+
+class _CodedEnum(str, Enum):
+    """
+    字符串枚举 + 整数编号
+    
+    字符串值用于序列化，整数编号 (按定义顺序) 用于内存中的比较和
+    列式存储 (np.uint8 数组)
+    """
+    
+    # 由 _assign_codes 在类创建后写入
+    _code: int
+    _BY_CODE: ClassVar[Tuple[Any, ...]]
+    _BY_VALUE: ClassVar[Dict[str, Any]]
+    
+    @property
+    def code(self) -> int:
+        """成员的整数编号"""
+        return self._code
+    
+    @classmethod
+    def from_code(cls, code: int) -> "Self":
+        """按整数编号查找成员 (负数不按序列下标从末尾取)"""
+        if not 0 <= code < len(cls._BY_CODE):
+            raise ValueError(f"{code!r} is not a valid {cls.__name__} code")
+        return cls._BY_CODE[code]
+    
+    @classmethod
+    def lookup(cls, value: str) -> "Self":
+        """
+        按字符串值查找成员 (反序列化时使用)
+        
+        与 cls(value) 结果相同，但只做一次字典查找，不经过 Enum 元类
+        """
+        if isinstance(value, cls):
+            return value
+        try:
+            return cls._BY_VALUE[value]
+        except KeyError:
+            raise ValueError(f"{value!r} is not a valid {cls.__name__}") from None
+    
+    @classmethod
+    def mask_of(cls, members: Iterable["_CodedEnum"]) -> int:
+        """成员集合 -> 位掩码 (第 code 位表示该成员)，判断归属只需一次位与"""
+        mask = 0
+        for member in members:
+            mask |= 1 << member._code
+        return mask
+
+
+def _assign_codes(cls):
+    """为枚举成员按定义顺序分配整数编号，并建立编号/字符串值 -> 成员的查找表"""
+    for code, member in enumerate(cls):
+        member._code = code
+    cls._BY_CODE = tuple(cls)
+    cls._BY_VALUE = {member.value: member for member in cls}
+    return cls
+
+
+@_assign_codes
+class DocumentType(_CodedEnum):
     """文档类型"""
     PDF = "pdf"
     DOCX = "docx"
@@ -20,7 +179,8 @@ class DocumentType(str, Enum):
     WEB_ARCHIVE = "web_archive"
 
 
-class EntityType(str, Enum):
+@_assign_codes
+class EntityType(_CodedEnum):
     """实体类型"""
     PERSON = "person"
     ORGANIZATION = "organization"
@@ -32,7 +192,8 @@ class EntityType(str, Enum):
     CUSTOM = "custom"
 
 
-class RelationType(str, Enum):
+@_assign_codes
+class RelationType(_CodedEnum):
     """文档关系类型"""
     REFERENCES = "references"          # 引用
     SUPERSEDES = "supersedes"          # 取代/更新
@@ -41,15 +202,16 @@ class RelationType(str, Enum):
     RELATES_TO = "relates_to"          # 相关
 
 
-class AlertSeverity(str, Enum):
-    """预警严重程度"""
+@_assign_codes
+class AlertSeverity(_CodedEnum):
+    """预警严重程度 (编号按严重程度递增)"""
     LOW = "low"
     MEDIUM = "medium"
     HIGH = "high"
     CRITICAL = "critical"
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class Entity:
     """提取的实体"""
     type: EntityType
@@ -61,9 +223,64 @@ class Entity:
     def __post_init__(self):
         if not 0 <= self.confidence <= 1:
             raise ValueError("Confidence must be between 0 and 1")
+    
+    # 同一文档中同类型、同值的实体视为同一个 (用于去重)
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Entity):
+            return NotImplemented
+        return (
+            self.type == other.type
+            and self.value == other.value
+            and self.source_doc_id == other.source_doc_id
+        )
+    
+    def __hash__(self) -> int:
+        return hash((self.type, self.value, self.source_doc_id))
+
+
+@dataclass(slots=True)
+class EntityColumns:
+    """
+    实体的列式视图 (每个属性一个数组)
+    
+    按类型/置信度筛选时只需扫描对应的数组，例如:
+        cols.indices(EntityType.PERSON, min_confidence=0.8)
+    """
+    types: np.ndarray           # uint8, EntityType.code
+    confidence: np.ndarray      # float32
+    values: List[str]
+    contexts: List[Optional[str]]
+    
+    @classmethod
+    def from_entities(cls, entities: List[Entity]) -> "EntityColumns":
+        """从实体列表构建列式视图"""
+        return cls(
+            types=np.fromiter(
+                (e.type.code for e in entities), dtype=np.uint8, count=len(entities)
+            ),
+            confidence=np.fromiter(
+                (e.confidence for e in entities), dtype=np.float32, count=len(entities)
+            ),
+            values=[e.value for e in entities],
+            contexts=[e.context for e in entities]
+        )
+    
+    def __len__(self) -> int:
+        return len(self.values)
+    
+    def indices(
+        self,
+        entity_type: Optional[EntityType] = None,
+        min_confidence: float = 0.0
+    ) -> np.ndarray:
+        """返回满足类型和最低置信度条件的实体下标"""
+        mask = self.confidence >= min_confidence
+        if entity_type is not None:
+            mask &= self.types == entity_type.code
+        return np.flatnonzero(mask)
 
 
-@dataclass
+@dataclass(slots=True)
 class DocumentMetadata:
     """文档元数据 - 这是系统的核心"""
     
@@ -81,24 +298,111 @@ class DocumentMetadata:
     # === 可选字段 (Optional) ===
     version: Optional[str] = None
     source_url: Optional[str] = None    # 如果是网页存档
-    custom_fields: Dict[str, Any] = field(default_factory=dict)
+    # 没有自定义字段时为 None (不为每个文档分配空 dict)，通过 add_custom 写入
+    custom_fields: Optional[Dict[str, Any]] = None
+    
+    def __post_init__(self):
+        # 部门/上传者/标签取值有限，驻留后相同字符串共享同一对象
+        if isinstance(self.uploader_id, str):
+            self.uploader_id = sys.intern(self.uploader_id)
+        if isinstance(self.department, str):
+            self.department = sys.intern(self.department)
+        self.tags = [sys.intern(tag) for tag in self.tags or ()]
+    
+    def add_custom(self, key: str, value: Any) -> None:
+        """设置自定义字段"""
+        if self.custom_fields is None:
+            self.custom_fields = {}
+        self.custom_fields[key] = value
+    
+    @property
+    def upload_time_us(self) -> int:
+        """上传时间 (Unix 微秒)"""
+        return to_epoch_us(self.upload_time)
+    
+    @property
+    def expiry_date_us(self) -> Optional[int]:
+        """过期时间 (Unix 微秒)"""
+        return _datetime_to_us(self.expiry_date)
     
     def validate(self) -> None:
         """验证元数据完整性"""
-        if not self.business_context or len(self.business_context.strip()) < 10:
+        context = self.business_context
+        if (
+            not context
+            or len(context) < MIN_BUSINESS_CONTEXT_LENGTH
+            or _stripped_length(context) < MIN_BUSINESS_CONTEXT_LENGTH
+        ):
             raise ValueError(
                 "business_context 必须至少10个字符! "
                 "请说明为什么上传这个文档，例如: "
                 "'新政策要求保存3年' 或 '关键客户合同，涉及连带责任'"
             )
         
-        if not self.uploader_id or "@" not in self.uploader_id:
+        if not self.uploader_id or not _EMAIL_RE.fullmatch(self.uploader_id):
             raise ValueError("uploader_id 必须是有效的邮箱地址")
+    
+    def to_msgpack(self) -> bytes:
+        """序列化为 msgpack"""
+        _require_msgpack()
+        return msgpack.packb(self._to_record(), use_bin_type=True)
+    
+    @classmethod
+    def from_msgpack(cls, data: bytes) -> "DocumentMetadata":
+        """从 msgpack 反序列化"""
+        _require_msgpack()
+        return cls._from_record(msgpack.unpackb(data, raw=False))
+    
+    def _to_record(self) -> Dict[str, Any]:
+        return {
+            "uploader_id": self.uploader_id,
+            "upload_time": _datetime_to_us(self.upload_time),
+            "department": self.department,
+            "business_context": self.business_context,
+            "tags": self.tags,
+            "related_doc_ids": self.related_doc_ids,
+            "expiry_date": _datetime_to_us(self.expiry_date),
+            "version": self.version,
+            "source_url": self.source_url,
+            "custom_fields": self.custom_fields
+        }
+    
+    @classmethod
+    def _from_record(cls, record: Dict[str, Any]) -> "DocumentMetadata":
+        return cls(
+            uploader_id=record["uploader_id"],
+            upload_time=from_epoch_us(record["upload_time"]),
+            department=record["department"],
+            business_context=record["business_context"],
+            tags=record["tags"],
+            related_doc_ids=record["related_doc_ids"],
+            expiry_date=_us_to_datetime(record["expiry_date"]),
+            version=record["version"],
+            source_url=record["source_url"],
+            custom_fields=record["custom_fields"]
+        )
+
+
+@dataclass(slots=True)
+class DocumentHeader:
+    """
+    文档头 - 筛选/排序时常用的少量字段
+    
+    不含正文、原始内容和向量，可以在不加载完整文档的情况下批量扫描
+    """
+    id: str
+    content_type: DocumentType
+    department: Optional[str]           # 未指定部门时为 None
+    upload_time_us: int                 # 上传时间 (Unix 微秒)
+    expiry_us: Optional[int] = None     # 过期时间 (Unix 微秒)
+    ai_risk_score: Optional[float] = None
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class Document:
     """文档主体"""
+    # 字段 (即 __slots__) 按访问频率排列: 筛选/排序常用的标量在前，
+    # 正文、向量、原始内容等大字段在后
     id: str
     file_path: str
     content_type: DocumentType
@@ -106,26 +410,311 @@ class Document:
     # 元数据
     metadata: DocumentMetadata
     
-    # 文档内容
-    raw_content: Optional[bytes] = None
-    parsed_text: Optional[str] = None
+    # 以下字段只能按关键字传入
+    _: KW_ONLY
     
-    # AI 增强数据
-    embeddings: Optional[List[float]] = None
-    ai_summary: Optional[str] = None
-    extracted_entities: List[Entity] = field(default_factory=list)
     ai_risk_score: Optional[float] = None
     
     # 系统字段
-    created_at: datetime = field(default_factory=datetime.now)
-    updated_at: datetime = field(default_factory=datetime.now)
     version: int = 1
+    created_at: datetime = field(default_factory=current_time)
+    updated_at: datetime = field(default_factory=current_time)
     
-    def __post_init__(self):
+    # AI 增强数据
+    ai_summary: Optional[str] = None
+    
+    # 文档内容
+    parsed_text: Optional[str] = None
+    extracted_entities: List[Entity] = field(default_factory=list)
+    
+    # float32 连续数组，入库时归一化，余弦相似度即点积
+    embeddings: Optional[np.ndarray] = field(default=None, repr=False, compare=False)
+    # embeddings 的对称 int8 量化 (embeddings ≈ embeddings_int8 * embedding_scale)，
+    # 用于存储和 int8 向量检索
+    embeddings_int8: Optional[np.ndarray] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    embedding_scale: float = field(default=0.0, init=False, repr=False, compare=False)
+    
+    # 运行时只作为构造参数 (不占用槽位)，实际存于 _raw_content，
+    # 读写经类定义之后安装的同名属性；类型检查器按普通字段看待
+    if TYPE_CHECKING:
+        raw_content: Optional[bytes] = None
+    else:
+        raw_content: InitVar[Optional[bytes]] = None
+    
+    # 延迟加载原始内容 (首次访问 raw_content 时调用)
+    content_loader: Optional[Callable[[], bytes]] = field(
+        default=None, repr=False, compare=False
+    )
+    # 原始内容在磁盘上的位置 (设置后 open_content 直接内存映射该文件)
+    content_path: Optional[str] = field(default=None, repr=False, compare=False)
+    # raw_content 属性的实际存储槽
+    _raw_content: Optional[bytes] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    
+    def __post_init__(self, raw_content: Optional[bytes]) -> None:  # type: ignore[override]
+        self._raw_content = raw_content
         self.metadata.validate()
+        self._derive_fields()
+    
+    # 文档按ID判等，不比较原始内容/向量等大字段
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Document):
+            return NotImplemented
+        return self.id == other.id
+    
+    def __hash__(self) -> int:
+        return hash(self.id)
+    
+    def _derive_fields(self) -> None:
+        """计算由其他字段派生的字段"""
+        if self.embeddings is not None:
+            self.embeddings = _normalize_embedding(self.embeddings)
+            self.embeddings_int8, self.embedding_scale = _quantize_int8(self.embeddings)
+    
+    @classmethod
+    def from_batch(cls, df: "pd.DataFrame") -> List["Document"]:
+        """
+        由 DataFrame 批量构建文档 (整列校验元数据，不再逐个校验)
+        
+        每行一个文档，列名与字段名一致:
+        - Document 字段: id, file_path, content_type (必需)，parsed_text 等 (可选)
+        - DocumentMetadata 字段: uploader_id, upload_time, department,
+          business_context (必需)，tags 等 (可选)；version 列对应 Document.version
+        
+        Raises:
+            ValueError: 元数据校验失败 (错误信息包含所有不合格的行索引)
+        """
+        context = df["business_context"].fillna("").astype(str)
+        bad = context.str.strip().str.len() < MIN_BUSINESS_CONTEXT_LENGTH
+        if bad.any():
+            raise ValueError(
+                f"business_context 必须至少{MIN_BUSINESS_CONTEXT_LENGTH}个字符! "
+                f"不合格的行: {df.index[bad].tolist()}"
+            )
+        
+        uploader = df["uploader_id"].fillna("").astype(str)
+        bad = ~uploader.str.fullmatch(_EMAIL_RE.pattern)
+        if bad.any():
+            raise ValueError(
+                f"uploader_id 必须是有效的邮箱地址! 不合格的行: {df.index[bad].tolist()}"
+            )
+        
+        metadata_columns = [name for name in df.columns if name in _BATCH_METADATA_FIELDS]
+        document_columns = [
+            name for name in df.columns
+            if name in _DOCUMENT_FIELD_NAMES and name != "metadata"
+        ]
+        
+        # 缺失值 (NaN/NaT) 统一为 None，有默认值的字段缺失时不传入，由默认值补齐
+        df = df.astype(object).where(df.notna(), None)
+        
+        documents = []
+        for record in df.to_dict("records"):
+            metadata = DocumentMetadata(**{
+                name: record[name] for name in metadata_columns
+                if record[name] is not None or name not in _METADATA_DEFAULTED_FIELDS
+            })
+            values = {
+                name: record[name] for name in document_columns
+                if record[name] is not None or name not in _DOCUMENT_DEFAULTED_FIELDS
+            }
+            values["content_type"] = DocumentType.lookup(values["content_type"])
+            documents.append(cls._from_trusted(metadata=metadata, **values))
+        
+        return documents
+    
+    @classmethod
+    def _from_trusted(cls, **kwargs: Any) -> "Document":
+        """
+        由可信数据构建文档，跳过元数据校验
+        
+        仅用于反序列化已经校验并持久化过的文档 (知识库加载、from_msgpack)
+        """
+        unknown = kwargs.keys() - _DOCUMENT_FIELD_NAMES
+        if unknown:
+            raise TypeError(f"未知字段: {sorted(unknown)}")
+        
+        document = cls.__new__(cls)
+        document._raw_content = kwargs.pop("raw_content", None)
+        for name, default, default_factory in _DOCUMENT_FIELD_DEFAULTS:
+            if name in kwargs:
+                value = kwargs[name]
+            elif default is not MISSING:
+                value = default
+            elif default_factory is not MISSING:
+                value = default_factory()
+            else:
+                raise TypeError(f"缺少字段: {name}")
+            setattr(document, name, value)
+        
+        document._derive_fields()
+        return document
+    
+    @property
+    def entity_columns(self) -> EntityColumns:
+        """
+        extracted_entities 的列式视图
+        每次访问都按当前实体列表重新构建 (列表可被原地修改，缓存无法可靠失效)，
+        需要多次使用时由调用方保存返回值
+        """
+        return EntityColumns.from_entities(self.extracted_entities)
+    
+    @property
+    def header(self) -> DocumentHeader:
+        """文档头"""
+        return DocumentHeader(
+            id=self.id,
+            content_type=self.content_type,
+            department=self.metadata.department,
+            upload_time_us=self.metadata.upload_time_us,
+            expiry_us=self.metadata.expiry_date_us,
+            ai_risk_score=self.ai_risk_score
+        )
+    
+    def open_content(self) -> memoryview:
+        """
+        以 memoryview 访问原始内容
+        
+        设置了 content_path 时内存映射该文件，不把整个文件读入内存；
+        否则返回 raw_content 的视图
+        """
+        if self._raw_content is None and self.content_path is not None:
+            return map_file(self.content_path)
+        return memoryview(self.raw_content or b"")
+    
+    def to_msgpack(self) -> bytes:
+        """
+        序列化为 msgpack
+        
+        时间存为整数微秒，枚举存为整数编号，embeddings 存为 float32 原始字节。
+        不包含 raw_content (原始文件单独存储)。
+        """
+        _require_msgpack()
+        record = {
+            "id": self.id,
+            "file_path": self.file_path,
+            "content_type": self.content_type.code,
+            "metadata": self.metadata._to_record(),
+            "parsed_text": self.parsed_text,
+            "embeddings": (
+                None if self.embeddings is None
+                else [list(self.embeddings.shape), self.embeddings.tobytes()]
+            ),
+            "ai_summary": self.ai_summary,
+            "extracted_entities": [
+                [e.type.code, e.value, e.confidence, e.source_doc_id, e.context]
+                for e in self.extracted_entities
+            ],
+            "ai_risk_score": self.ai_risk_score,
+            "created_at": _datetime_to_us(self.created_at),
+            "updated_at": _datetime_to_us(self.updated_at),
+            "version": self.version
+        }
+        return msgpack.packb(record, use_bin_type=True)
+    
+    @classmethod
+    def from_msgpack(
+        cls,
+        data: bytes,
+        content_loader: Optional[Callable[[], bytes]] = None
+    ) -> "Document":
+        """从 msgpack 反序列化 (可传入 content_loader 延迟加载原始内容)"""
+        _require_msgpack()
+        record = msgpack.unpackb(data, raw=False)
+        
+        embeddings = record["embeddings"]
+        if embeddings is not None:
+            shape, buffer = embeddings
+            embeddings = np.frombuffer(buffer, dtype=np.float32).reshape(shape)
+        
+        return cls._from_trusted(
+            id=record["id"],
+            file_path=record["file_path"],
+            content_type=DocumentType.from_code(record["content_type"]),
+            metadata=DocumentMetadata._from_record(record["metadata"]),
+            parsed_text=record["parsed_text"],
+            embeddings=embeddings,
+            ai_summary=record["ai_summary"],
+            extracted_entities=[
+                Entity(EntityType.from_code(code), value, confidence, source_doc_id, context)
+                for code, value, confidence, source_doc_id, context
+                in record["extracted_entities"]
+            ],
+            ai_risk_score=record["ai_risk_score"],
+            created_at=from_epoch_us(record["created_at"]),
+            updated_at=from_epoch_us(record["updated_at"]),
+            version=record["version"],
+            content_loader=content_loader
+        )
+
+
+def _normalize_embedding(values: Any) -> np.ndarray:
+    """转为 float32 连续数组并做 L2 归一化 (零向量保持不变)"""
+    vector = np.array(values, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+def _quantize_int8(vector: np.ndarray) -> Tuple[np.ndarray, float]:
+    """对称 int8 量化，返回 (量化值, 缩放系数)"""
+    max_abs = float(np.max(np.abs(vector))) if vector.size else 0.0
+    if max_abs == 0:
+        return np.zeros(vector.shape, dtype=np.int8), 0.0
+    scale = max_abs / 127
+    return np.round(vector / scale).astype(np.int8), scale
+
+
+def _get_raw_content(self: Document) -> Optional[bytes]:
+    if self._raw_content is None:
+        if self.content_loader is not None:
+            self._raw_content = self.content_loader()
+        elif self.content_path is not None:
+            with open(self.content_path, 'rb') as f:
+                self._raw_content = f.read()
+    return self._raw_content
+
 
+def _set_raw_content(self: Document, value: Optional[bytes]) -> None:
+    self._raw_content = value
 
-@dataclass
+
+# raw_content 可能是几十 MB 的原始文件，只在真正访问时才读取。
+# 属性须在类创建后安装，否则会被 dataclass 当作 InitVar 的默认值
+Document.raw_content = property(_get_raw_content, _set_raw_content)  # type: ignore[misc, assignment]
+
+# Document._from_trusted 按字段顺序赋值 (InitVar raw_content 单独写入 _raw_content)
+_DOCUMENT_FIELD_DEFAULTS = tuple(
+    (f.name, f.default, f.default_factory)
+    for f in fields(Document)
+    if f.name != "_raw_content"
+    and (f.init or f.default is not MISSING or f.default_factory is not MISSING)
+)
+_DOCUMENT_FIELD_NAMES = frozenset(
+    f.name for f in fields(Document) if f.init
+) | {"raw_content"}
+
+# 有默认值 (default 或 default_factory) 的字段，from_batch 中缺失值不覆盖默认值
+_DOCUMENT_DEFAULTED_FIELDS = frozenset(
+    name for name, default, default_factory in _DOCUMENT_FIELD_DEFAULTS
+    if default is not MISSING or default_factory is not MISSING
+)
+_METADATA_DEFAULTED_FIELDS = frozenset(
+    f.name for f in fields(DocumentMetadata)
+    if f.default is not MISSING or f.default_factory is not MISSING
+)
+
+# Document.from_batch 中归入元数据的列 (version 与 Document.version 同名，归文档)
+_BATCH_METADATA_FIELDS = frozenset(
+    f.name for f in fields(DocumentMetadata) if f.name != "version"
+)
+
+
+@dataclass(slots=True, eq=False)
 class DocumentRelation:
     """文档之间的关系"""
     source_doc_id: str
@@ -133,46 +722,96 @@ class DocumentRelation:
     relation_type: RelationType
     confidence: float
     description: Optional[str] = None
-    created_at: datetime = field(default_factory=datetime.now)
+    created_at: datetime = field(default_factory=current_time)
+    
+    # 同一对文档之间同类型的关系视为同一条边
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, DocumentRelation):
+            return NotImplemented
+        return (
+            self.source_doc_id == other.source_doc_id
+            and self.target_doc_id == other.target_doc_id
+            and self.relation_type == other.relation_type
+        )
+    
+    def __hash__(self) -> int:
+        return hash((self.source_doc_id, self.target_doc_id, self.relation_type))
 
 
-@dataclass
+@dataclass(slots=True)
 class AgentResponse:
     """Agent 响应结构"""
     answer: str
     sources: List[str]  # 引用的文档ID列表
     confidence: float
     reasoning_trace: Optional[List[str]] = None  # 推理过程
-    timestamp: datetime = field(default_factory=datetime.now)
+    timestamp: datetime = field(default_factory=current_time)
 
 
-@dataclass
+# Alert.flags 的位布局: 第 30-31 位为严重程度编号，第 29 位为是否已确认
+ALERT_SEVERITY_SHIFT = 30
+ALERT_ACKNOWLEDGED_BIT = 1 << 29
+
+
+@dataclass(slots=True)
 class Alert:
     """系统预警"""
     type: str
     severity: AlertSeverity
     message: str
     affected_doc_ids: List[str] = field(default_factory=list)
-    metadata: Dict[str, Any] = field(default_factory=dict)
-    created_at: datetime = field(default_factory=datetime.now)
+    # 没有附加信息时为 None，通过 add_metadata 写入
+    metadata: Optional[Dict[str, Any]] = None
+    created_at: datetime = field(default_factory=current_time)
     acknowledged: bool = False
+    
+    def __post_init__(self):
+        self.severity = AlertSeverity.lookup(self.severity)
+    
+    @property
+    def flags(self) -> int:
+        """严重程度与确认状态按 ALERT_* 位布局打包的整数"""
+        flags = self.severity.code << ALERT_SEVERITY_SHIFT
+        if self.acknowledged:
+            flags |= ALERT_ACKNOWLEDGED_BIT
+        return flags
+    
+    def add_metadata(self, key: str, value: Any) -> None:
+        """设置附加信息"""
+        if self.metadata is None:
+            self.metadata = {}
+        self.metadata[key] = value
+    
+    @staticmethod
+    def flags_array(alerts: List["Alert"]) -> np.ndarray:
+        """
+        批量取出 flags (uint32 数组)，用于向量化筛选，例如:
+            (flags >> ALERT_SEVERITY_SHIFT) >= AlertSeverity.HIGH.code
+        """
+        return np.fromiter((a.flags for a in alerts), dtype=np.uint32, count=len(alerts))
 
 
-@dataclass
+@dataclass(slots=True)
 class SearchQuery:
     """搜索查询"""
     query: str
     department: Optional[str] = None
     tags: Optional[List[str]] = None
-    date_range: Optional[tuple[datetime, datetime]] = None
+    # 时间可以是 datetime 或 Unix 微秒 (to_epoch_us)
+    date_range: Optional[tuple[datetime | int, datetime | int]] = None
     doc_types: Optional[List[DocumentType]] = None
     limit: int = 10
     
     # 时间旅行查询
-    as_of_date: Optional[datetime] = None  # 查询"某个时间点的知识"
+    as_of_date: Optional[datetime | int] = None  # 查询"某个时间点的知识"
+    
+    @property
+    def doc_type_mask(self) -> int:
+        """doc_types 的位掩码 (0 表示不限类型)"""
+        return DocumentType.mask_of(self.doc_types) if self.doc_types else 0
 
 
-@dataclass
+@dataclass(slots=True)
 class SearchResult:
     """搜索结果"""
     document: Document
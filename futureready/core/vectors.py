@@ -0,0 +1,67 @@
+"""
+向量检索内核
+对归一化的 float32 向量 (Document.embeddings) 做余弦相似度 top-k 检索
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+try:
+    import numba  # 可选依赖，JIT 编译并行的打分内核
+except ImportError:
+    numba = None
+
+
+if numba is not None:
+
+    @numba.njit(cache=True, parallel=True, fastmath=True)
+    def _dot_scores(vectors: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """逐行点积 (按文档并行)"""
+        n, dim = vectors.shape
+        scores = np.empty(n, dtype=np.float32)
+        for i in numba.prange(n):
+            acc = np.float32(0.0)
+            for j in range(dim):
+                acc += vectors[i, j] * query[j]
+            scores[i] = acc
+        return scores
+
+else:
+
+    def _dot_scores(vectors: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """逐行点积 (numpy 矩阵向量乘)"""
+        return vectors @ query
+
+
+def topk_cosine(
+    vectors: np.ndarray, query: np.ndarray, k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    余弦相似度 top-k 检索
+
+    Args:
+        vectors: (N, D) 的 float32 矩阵，每行已 L2 归一化
+        query: (D,) 的查询向量 (无需归一化)
+        k: 返回的结果数
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (行下标, 相似度)，按相似度降序
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    query = np.ascontiguousarray(query, dtype=np.float32)
+
+    norm = np.linalg.norm(query)
+    if norm > 0:
+        query = query / norm
+
+    k = min(k, len(vectors))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+
+    scores = _dot_scores(vectors, query)
+
+    # 先用 argpartition 选出 top-k (O(N))，只对这 k 个排序
+    top = np.argpartition(scores, -k)[-k:]
+    top = top[np.argsort(scores[top])[::-1]]
+    return top, scores[top]
@@ -23,11 +23,10 @@ setup(
         "Topic :: Software Development :: Libraries :: Python Modules",
         "License :: OSI Approved :: MIT License",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.9",
         "Programming Language :: Python :: 3.10",
         "Programming Language :: Python :: 3.11",
     ],
-    python_requires=">=3.9",
+    python_requires=">=3.10",
     install_requires=[
         "numpy>=1.24.0",
         "pandas>=2.0.0",
@@ -48,6 +47,9 @@ setup(
             "beautifulsoup4>=4.12.0",
             "fastapi>=0.109.0",
             "uvicorn>=0.27.0",
+            "orjson>=3.9.0",
+            "numba>=0.59",
+            "msgpack>=1.0.0",
         ],
     },
 )
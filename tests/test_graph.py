@@ -0,0 +1,75 @@
+"""
+文档关系图测试
+"""
+
+import numpy as np
+import pytest
+
+from futureready.core.graph import AdjacencyCSR, build_graph
+from futureready.core.knowledge_base import KnowledgeBase
+
+
+def test_transpose_reverses_edges():
+    """反向图中每条边方向相反，邻居按源节点编号排列"""
+    # 0 -> 1, 0 -> 2, 1 -> 2, 3 -> 0
+    graph = AdjacencyCSR.from_edges(
+        4,
+        np.array([0, 1, 0, 3], dtype=np.uint32),
+        np.array([1, 2, 2, 0], dtype=np.uint32),
+    )
+    assert [graph.neighbors(i).tolist() for i in range(4)] == [[1, 2], [2], [], [0]]
+
+    reverse = graph.transpose()
+    assert reverse.num_nodes == 4
+    assert [reverse.neighbors(i).tolist() for i in range(4)] == [[3], [0], [0, 1], []]
+    assert reverse.indices.dtype == np.uint32
+
+    again = reverse.transpose()
+    assert [again.neighbors(i).tolist() for i in range(4)] == [[1, 2], [2], [], [0]]
+
+
+def test_build_graph_interns_targets():
+    """关联的文档即使不在键中也会分配编号"""
+    interner, graph = build_graph({"a": ["b", "c"], "b": ["c"], "d": []})
+    assert len(interner) == 4
+    assert "c" in interner and "x" not in interner
+    assert interner.ids_of(graph.neighbors(interner.get("a"))) == ["b", "c"]
+    assert graph.neighbors(interner.get("c")).tolist() == []
+
+    reverse = graph.transpose()
+    assert interner.ids_of(reverse.neighbors(interner.get("c"))) == ["a", "b"]
+    assert reverse.neighbors(interner.get("d")).tolist() == []
+
+
+@pytest.mark.asyncio
+async def test_find_referencing(tmp_path):
+    """find_referencing 返回关联了指定文档的文档，更新关联后结果随之变化"""
+    kb = KnowledgeBase(str(tmp_path / "kb"), department="legal")
+
+    async def ingest(name: str, related: list) -> str:
+        path = tmp_path / f"{name}.txt"
+        path.write_text(name, encoding="utf-8")
+        doc = await kb.ingest(
+            str(path),
+            {
+                "uploader": "tester@example.com",
+                "department": "legal",
+                "business_context": "关系图测试用的合同文档",
+                "related_docs": related,
+            },
+        )
+        return doc.id
+
+    master = await ingest("master", [])
+    annex = await ingest("annex", [master])
+    amendment = await ingest("amendment", [master, annex])
+
+    assert sorted(kb.find_referencing(master)) == sorted([annex, amendment])
+    assert kb.find_referencing(annex) == [amendment]
+    assert kb.find_referencing(amendment) == []
+    assert kb.find_referencing("unknown") == []
+
+    await kb.update_metadata(amendment, {"related_doc_ids": [annex]})
+    assert kb.find_referencing(master) == [annex]
+    assert kb.find_referencing(annex) == [amendment]
+    kb.close()
@@ -0,0 +1,73 @@
+"""
+批量摄入测试
+"""
+
+from pathlib import Path
+
+import pytest
+
+from futureready.core.knowledge_base import KnowledgeBase
+from futureready.core.models import SearchQuery
+
+
+def _items(tmp_path, count: int) -> list:
+    """生成 count 个 (文件路径, 元数据) 摄入项"""
+    items = []
+    for i in range(count):
+        path = tmp_path / f"batch{i}.txt"
+        path.write_text(f"第{i}份批量文档的正文", encoding="utf-8")
+        items.append(
+            (
+                str(path),
+                {
+                    "uploader": "tester@example.com",
+                    "department": "legal",
+                    "business_context": f"批量导入的历史合同，编号 {i:04d}",
+                    "tags": ["batch"],
+                },
+            )
+        )
+    return items
+
+
+@pytest.mark.asyncio
+async def test_ingest_batch(tmp_path):
+    """批量摄入按输入顺序返回文档，共用同一个上传时间，重新打开后全部可见"""
+    base = tmp_path / "kb"
+    items = _items(tmp_path, 5)
+    kb = KnowledgeBase(str(base), department="legal")
+    docs = await kb.ingest_batch(items)
+
+    assert [doc.file_path for doc in docs] == [Path(path).name for path, _ in items]
+    assert len({doc.metadata.upload_time for doc in docs}) == 1
+    assert sorted(kb.index) == sorted(doc.id for doc in docs)
+    kb.close()
+
+    reopened = KnowledgeBase(str(base), department="legal")
+    assert sorted(reopened.index) == sorted(doc.id for doc in docs)
+    hits = await reopened.search(SearchQuery(query="批量文档", limit=100))
+    assert {hit.document.id for hit in hits} == {doc.id for doc in docs}
+    reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_ingest_batch_with_missing_file(tmp_path):
+    """有文件缺失时抛出异常，但其余文档已经摄入并落盘"""
+    base = tmp_path / "kb"
+    items = _items(tmp_path, 5)
+    missing = str(tmp_path / "missing.txt")
+    items.insert(2, (missing, dict(items[0][1])))
+
+    kb = KnowledgeBase(str(base), department="legal")
+    with pytest.raises(FileNotFoundError):
+        await kb.ingest_batch(items)
+
+    stored = {doc_info["file_path"] for doc_info in kb.index.values()}
+    assert stored == {Path(path).name for path, _ in items if path != missing}
+    kb.close()
+
+    reopened = KnowledgeBase(str(base), department="legal")
+    assert {doc_info["file_path"] for doc_info in reopened.index.values()} == stored
+    hits = await reopened.search(SearchQuery(query="", tags=["batch"], limit=100))
+    assert len(hits) == len(stored)
+    reopened.close()
@@ -0,0 +1,87 @@
+"""
+到期文档查询 (list_expiring) 测试
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+
+from futureready.core.knowledge_base import KnowledgeBase
+
+NOW = datetime(2030, 1, 1, 12, 0)
+
+# (到期时间相对 NOW 的天数, 部门, 标签)
+DOCUMENTS = [
+    (30, "legal", ["contract"]),
+    (10, "legal", ["policy"]),
+    (45, "hr", ["contract"]),
+    (90, "legal", ["contract"]),
+    (None, "legal", ["contract"]),
+]
+
+
+@pytest_asyncio.fixture
+async def kb_and_ids(tmp_path):
+    """摄入测试文档，返回 (知识库, 文档ID列表)"""
+    kb = KnowledgeBase(str(tmp_path / "kb"))
+    doc_ids = []
+    for i, (days, department, tags) in enumerate(DOCUMENTS):
+        path = tmp_path / f"expiry{i}.txt"
+        path.write_text(f"第{i}份合同", encoding="utf-8")
+        doc = await kb.ingest(
+            str(path),
+            {
+                "uploader": "tester@example.com",
+                "department": department,
+                "business_context": "到期提醒测试用的合同文档",
+                "tags": tags,
+                "expiry_date": None if days is None else NOW + timedelta(days=days),
+            },
+        )
+        doc_ids.append(doc.id)
+    yield kb, doc_ids
+    kb.close()
+
+
+@pytest.mark.asyncio
+async def test_window_is_inclusive_and_sorted_by_expiry(kb_and_ids):
+    """时间窗口两端都包含，结果按到期时间排序，没有到期时间的文档不返回"""
+    kb, ids = kb_and_ids
+    assert kb.list_expiring(NOW, NOW + timedelta(days=60)) == [ids[1], ids[0], ids[2]]
+    assert kb.list_expiring(NOW + timedelta(days=10), NOW + timedelta(days=30)) == [
+        ids[1],
+        ids[0],
+    ]
+    year = NOW + timedelta(days=365)
+    assert kb.list_expiring(NOW, year) == [ids[1], ids[0], ids[2], ids[3]]
+    assert kb.list_expiring(NOW + timedelta(days=11), NOW + timedelta(days=29)) == []
+
+
+@pytest.mark.asyncio
+async def test_department_and_tag_filters(kb_and_ids):
+    """部门必须一致，标签命中任一即可"""
+    kb, ids = kb_and_ids
+    start, end = NOW, NOW + timedelta(days=60)
+    assert kb.list_expiring(start, end, department="legal") == [ids[1], ids[0]]
+    assert kb.list_expiring(start, end, tags=["contract"]) == [ids[0], ids[2]]
+    assert kb.list_expiring(start, end, department="legal", tags=["contract"]) == [
+        ids[0]
+    ]
+    assert kb.list_expiring(start, end, tags=["contract", "policy"]) == [
+        ids[1],
+        ids[0],
+        ids[2],
+    ]
+    assert kb.list_expiring(start, end, department="finance") == []
+
+
+@pytest.mark.asyncio
+async def test_reopen_keeps_expiry_index(kb_and_ids, tmp_path):
+    """重新打开知识库后到期时间索引不变"""
+    kb, ids = kb_and_ids
+    kb.flush_index()
+    reopened = KnowledgeBase(str(tmp_path / "kb"))
+    end = NOW + timedelta(days=365)
+    assert reopened.list_expiring(NOW, end) == kb.list_expiring(NOW, end)
+    reopened.close()
@@ -0,0 +1,311 @@
+"""
+知识库索引测试: 旧版索引迁移、重新打开、元数据更新与搜索结果一致性
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+
+import pytest
+
+from futureready.core.knowledge_base import KnowledgeBase
+from futureready.core.models import SearchQuery
+
+DOCUMENTS = [
+    (
+        "合作协议",
+        "甲乙双方合作协议。乙方对其提供的服务质量承担全部责任。甲方不承担连带责任。",
+        "与服务商的重要合作协议，涉及连带责任豁免",
+        ["contract", "liability"],
+    ),
+    (
+        "管理制度",
+        "企业合同管理制度。原则上公司不接受连带责任条款。Contract Management rules.",
+        "公司内部合同管理规范 policy doc",
+        ["policy"],
+    ),
+    (
+        "入职说明",
+        "Onboarding checklist for new employees.",
+        "HR readme document for onboarding",
+        ["hr"],
+    ),
+    (
+        "二元组误报",
+        "only ab here, and bc there",
+        "bigram false positive sample",
+        ["misc"],
+    ),
+]
+
+QUERIES = ["连带责任", "责", "contract", "abc", "onboarding", "policy", "不存在的词"]
+
+
+async def _ingest_all(kb: KnowledgeBase, tmp_path) -> list:
+    """摄入测试文档，返回文档ID列表"""
+    doc_ids = []
+    for i, (name, text, context, tags) in enumerate(DOCUMENTS):
+        path = tmp_path / f"doc{i}.txt"
+        path.write_text(f"{name}\n{text}", encoding="utf-8")
+        doc = await kb.ingest(
+            str(path),
+            {
+                "uploader": "tester@example.com",
+                "department": "legal",
+                "business_context": context,
+                "tags": tags,
+            },
+        )
+        doc_ids.append(doc.id)
+    return doc_ids
+
+
+async def _search_all(kb: KnowledgeBase) -> dict:
+    """对所有测试查询执行搜索，返回 {查询: [(文档ID, 得分)]}"""
+    results = {}
+    for query in QUERIES:
+        hits = await kb.search(SearchQuery(query=query, limit=100))
+        results[query] = [(hit.document.id, round(hit.score, 6)) for hit in hits]
+    return results
+
+
+async def _reference_scores(kb: KnowledgeBase, query: str) -> dict:
+    """逐个加载文档并按子串匹配打分 (不经过任何索引)"""
+    query_lower = query.lower()
+    scores = {}
+    for doc_id in kb.index:
+        doc = await kb.get_document(doc_id)
+        score = 0.0
+        if query_lower in doc.metadata.business_context.lower():
+            score += 0.5
+        if any(query_lower in tag.lower() for tag in doc.metadata.tags):
+            score += 0.3
+        if doc.parsed_text and query_lower in doc.parsed_text.lower():
+            score += 0.2
+        if score > 0:
+            scores[doc_id] = round(min(score, 1.0), 6)
+    return scores
+
+
+@pytest.mark.asyncio
+async def test_search_matches_reference(tmp_path):
+    """搜索结果与不经过索引的逐文档打分一致 (bigram 误报不计入正文命中)"""
+    kb = KnowledgeBase(str(tmp_path / "kb"), department="legal")
+    await _ingest_all(kb, tmp_path)
+
+    for query, hits in (await _search_all(kb)).items():
+        assert dict(hits) == await _reference_scores(kb, query), query
+        scores = [score for _, score in hits]
+        assert scores == sorted(scores, reverse=True)
+
+    kb.close()
+
+
+@pytest.mark.asyncio
+async def test_reopen_preserves_index_and_results(tmp_path):
+    """重新打开知识库后索引条目与搜索结果不变，倒排索引丢失时可重建"""
+    base = tmp_path / "kb"
+    kb = KnowledgeBase(str(base), department="legal")
+    doc_ids = await _ingest_all(kb, tmp_path)
+    index = kb.index
+    expected = await _search_all(kb)
+    kb.close()
+
+    reopened = KnowledgeBase(str(base), department="legal")
+    assert reopened.index == index
+    assert sorted(reopened.index) == sorted(doc_ids)
+    assert await _search_all(reopened) == expected
+    reopened.close()
+
+    (base / "index" / "inverted.json").unlink()
+    rebuilt = KnowledgeBase(str(base), department="legal")
+    assert await _search_all(rebuilt) == expected
+    rebuilt.close()
+
+
+@pytest.mark.asyncio
+async def test_index_rows_do_not_store_parsed_text(tmp_path):
+    """SQLite 索引条目不包含正文"""
+    base = tmp_path / "kb"
+    kb = KnowledgeBase(str(base), department="legal")
+    await _ingest_all(kb, tmp_path)
+    kb.close()
+
+    with sqlite3.connect(base / "index" / "kb.sqlite") as db:
+        rows = db.execute("SELECT entry FROM documents").fetchall()
+    assert len(rows) == len(DOCUMENTS)
+    for (entry,) in rows:
+        assert "parsed_text" not in json.loads(entry)
+
+
+@pytest.mark.asyncio
+async def test_update_metadata_persists_and_is_searchable(tmp_path):
+    """更新元数据后立即可搜索，重新打开后仍然生效"""
+    base = tmp_path / "kb"
+    kb = KnowledgeBase(str(base), department="legal")
+    doc_ids = await _ingest_all(kb, tmp_path)
+    target = doc_ids[2]
+
+    updated = await kb.update_metadata(
+        target,
+        {
+            "tags": ["renewal"],
+            "business_context": "年度续约提醒，需要法务复核",
+        },
+    )
+    assert updated.version == 2
+
+    async def check(kb: KnowledgeBase) -> None:
+        hits = await kb.search(SearchQuery(query="renewal"))
+        assert [hit.document.id for hit in hits] == [target]
+        hits = await kb.search(SearchQuery(query="续约"))
+        assert [hit.document.id for hit in hits] == [target]
+        # 旧的业务上下文和标签不再命中
+        hits = await kb.search(SearchQuery(query="readme"))
+        assert target not in [hit.document.id for hit in hits]
+        hits = await kb.search(SearchQuery(query="", tags=["hr"]))
+        assert hits == []
+        assert kb.index[target]["version"] == 2
+        for query in QUERIES:
+            hits = await kb.search(SearchQuery(query=query, limit=100))
+            expected = await _reference_scores(kb, query)
+            assert {hit.document.id: round(hit.score, 6) for hit in hits} == expected
+
+    await check(kb)
+    kb.close()
+
+    reopened = KnowledgeBase(str(base), department="legal")
+    await check(reopened)
+    reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_migrates_legacy_json_index(tmp_path):
+    """首次打开时迁移旧版 index.json"""
+    base = tmp_path / "kb"
+    kb = KnowledgeBase(str(base), department="legal")
+    await _ingest_all(kb, tmp_path)
+    expected = await _search_all(kb)
+    index = kb.index
+    kb.close()
+
+    # 旧版 index.json: 每个条目只有以下字段，以缩进的 JSON 整体写入
+    legacy = {
+        doc_id: {
+            "file_path": entry["file_path"],
+            "department": entry["department"],
+            "tags": entry["tags"],
+            "upload_time": entry["upload_time"],
+            "business_context": entry["business_context"],
+        }
+        for doc_id, entry in index.items()
+    }
+    index_path = base / "index"
+    for path in index_path.iterdir():
+        path.unlink()
+    (index_path / "index.json").write_text(
+        json.dumps(legacy, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+
+    migrated = KnowledgeBase(str(base), department="legal")
+    assert migrated.index == index
+    assert await _search_all(migrated) == expected
+    migrated.close()
+
+    # 迁移结果已写入数据库，旧文件不再参与加载
+    (index_path / "index.json").unlink()
+    reopened = KnowledgeBase(str(base), department="legal")
+    assert reopened.index == index
+    assert await _search_all(reopened) == expected
+    reopened.close()
+
+
+def test_use_from_another_thread(tmp_path):
+    """在一个线程中创建的知识库可以在另一个线程的事件循环中使用"""
+    kb = KnowledgeBase(str(tmp_path / "kb"), department="legal")
+    errors = []
+
+    def worker():
+        try:
+            doc_ids = asyncio.run(_ingest_all(kb, tmp_path))
+            hits = asyncio.run(kb.search(SearchQuery(query="", limit=100)))
+            assert [hit.document.id for hit in hits] == doc_ids
+        except BaseException as e:  # 线程中的异常交给主线程断言
+            errors.append(e)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    assert errors == []
+
+    kb.close()
+    reopened = KnowledgeBase(str(tmp_path / "kb"), department="legal")
+    assert len(reopened.index) == len(DOCUMENTS)
+    reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_unfiltered_results_keep_upload_order_after_reopen(tmp_path):
+    """更新过的文档在重新打开后仍按上传时间排列"""
+    base = tmp_path / "kb"
+    kb = KnowledgeBase(str(base), department="legal")
+    doc_ids = await _ingest_all(kb, tmp_path)
+    await kb.update_metadata(doc_ids[0], {"tags": ["renewal"]})
+
+    hits = await kb.search(SearchQuery(query="", limit=100))
+    assert [hit.document.id for hit in hits] == doc_ids
+    kb.close()
+
+    reopened = KnowledgeBase(str(base), department="legal")
+    hits = await reopened.search(SearchQuery(query="", limit=100))
+    assert [hit.document.id for hit in hits] == doc_ids
+    hits = await reopened.search(SearchQuery(query="", limit=2))
+    assert [hit.document.id for hit in hits] == doc_ids[:2]
+    reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_update_metadata_does_not_mutate_returned_documents(tmp_path):
+    """更新元数据不修改此前返回的文档对象，保存失败时缓存不受影响"""
+    kb = KnowledgeBase(str(tmp_path / "kb"), department="legal")
+    doc_ids = await _ingest_all(kb, tmp_path)
+    target = doc_ids[0]
+
+    before = await kb.get_document(target)
+    old_tags = list(before.metadata.tags)
+    updated = await kb.update_metadata(target, {"tags": ["renewal"]})
+    assert updated is not before
+    assert before.metadata.tags == old_tags
+    assert before.version == 1
+    assert (await kb.get_document(target)).metadata.tags == ["renewal"]
+
+    async def failing_save(document, include_content=True):
+        raise OSError("磁盘已满")
+
+    kb._save_document = failing_save
+    current = await kb.get_document(target)
+    with pytest.raises(OSError):
+        await kb.update_metadata(target, {"tags": ["lost"]})
+    assert current.metadata.tags == ["renewal"]
+    assert (await kb.get_document(target)).version == 2
+    kb.close()
+
+
+@pytest.mark.asyncio
+async def test_text_terms_are_stored_once(tmp_path):
+    """正文词项只保存在 text_terms 中，不再重复写入 terms"""
+    base = tmp_path / "kb"
+    kb = KnowledgeBase(str(base), department="legal")
+    await _ingest_all(kb, tmp_path)
+    kb.close()
+
+    rebuilt = KnowledgeBase(str(base), department="legal")
+    hits = await rebuilt.search(SearchQuery(query="checklist"))
+    assert len(hits) == 1
+    rebuilt.close()
+
+    data = json.loads((base / "index" / "inverted.json").read_text(encoding="utf-8"))
+    # "kl" 只出现在正文 "checklist" 中
+    assert "kl" in data["text_terms"]
+    assert "kl" not in data["terms"]
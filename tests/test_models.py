@@ -0,0 +1,197 @@
+"""
+核心数据模型测试
+"""
+
+import dataclasses
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from futureready.core.models import (
+    ALERT_ACKNOWLEDGED_BIT,
+    ALERT_SEVERITY_SHIFT,
+    Alert,
+    AlertSeverity,
+    Document,
+    DocumentMetadata,
+    DocumentType,
+    Entity,
+    EntityType,
+)
+
+CREATED_AT = datetime(2024, 1, 1, 9, 30)
+
+
+def _alert(**changes) -> Alert:
+    values = dict(
+        type="contract_expiry",
+        severity=AlertSeverity.HIGH,
+        message="合同即将到期",
+        created_at=CREATED_AT,
+    )
+    values.update(changes)
+    return Alert(**values)
+
+
+def test_alert_equality_includes_severity_and_acknowledged():
+    """严重程度或确认状态不同的预警不相等"""
+    assert _alert() == _alert()
+    assert _alert() != _alert(severity=AlertSeverity.LOW)
+    assert _alert() != _alert(acknowledged=True)
+
+
+def test_alert_repr_shows_severity_and_acknowledged():
+    """repr 中包含严重程度与确认状态"""
+    text = repr(_alert(acknowledged=True))
+    assert "AlertSeverity.HIGH" in text
+    assert "acknowledged=True" in text
+
+
+def test_alert_replace_and_asdict_keep_severity():
+    """dataclasses.replace / asdict 保留严重程度与确认状态"""
+    alert = _alert(severity=AlertSeverity.CRITICAL, acknowledged=True)
+    replaced = dataclasses.replace(alert, message="已续约")
+    assert replaced.message == "已续约"
+    assert replaced.severity is AlertSeverity.CRITICAL
+    assert replaced.acknowledged is True
+
+    record = dataclasses.asdict(alert)
+    assert record["severity"] is AlertSeverity.CRITICAL
+    assert record["acknowledged"] is True
+
+
+def test_alert_flags_follow_fields():
+    """flags 按位布局反映当前的严重程度与确认状态，字符串严重程度会转为枚举"""
+    alert = _alert(severity="low")
+    assert alert.severity is AlertSeverity.LOW
+    assert alert.flags == AlertSeverity.LOW.code << ALERT_SEVERITY_SHIFT
+
+    alert.severity = AlertSeverity.CRITICAL
+    alert.acknowledged = True
+    assert alert.flags == (
+        AlertSeverity.CRITICAL.code << ALERT_SEVERITY_SHIFT | ALERT_ACKNOWLEDGED_BIT
+    )
+
+    flags = Alert.flags_array([_alert(severity=s) for s in AlertSeverity])
+    assert flags.dtype == np.uint32
+    high = (flags >> ALERT_SEVERITY_SHIFT) >= AlertSeverity.HIGH.code
+    assert high.tolist() == [False, False, True, True]
+
+
+def _frame(**overrides) -> pd.DataFrame:
+    """三行合法的 from_batch 输入，可按列覆盖"""
+    columns = {
+        "id": ["d0", "d1", "d2"],
+        "file_path": ["a.pdf", "b.txt", "c.md"],
+        "content_type": ["pdf", "txt", "md"],
+        "uploader_id": ["a@example.com", "b@example.com", "c@example.com"],
+        "upload_time": [CREATED_AT] * 3,
+        "department": ["legal", "hr", "legal"],
+        "business_context": ["年度框架合同，涉及付款条款"] * 3,
+        "tags": [["contract"], ["policy"], ["contract", "draft"]],
+    }
+    columns.update(overrides)
+    return pd.DataFrame(columns)
+
+
+def test_from_batch_builds_documents():
+    """每行构建一个文档，元数据列与文档列分别归位"""
+    docs = Document.from_batch(_frame(version=[1, 2, 3]))
+
+    assert [doc.id for doc in docs] == ["d0", "d1", "d2"]
+    assert [doc.content_type for doc in docs] == [
+        DocumentType.PDF,
+        DocumentType.TXT,
+        DocumentType.MARKDOWN,
+    ]
+    assert docs[2].metadata.tags == ["contract", "draft"]
+    assert docs[1].metadata.department == "hr"
+    assert docs[0].metadata.upload_time == CREATED_AT
+    assert [doc.version for doc in docs] == [1, 2, 3]
+    assert docs[0].metadata.version is None
+
+
+def test_from_batch_rejects_invalid_rows():
+    """校验失败时错误信息列出所有不合格的行"""
+    with pytest.raises(ValueError, match=r"\[0, 2\]"):
+        Document.from_batch(
+            _frame(business_context=["太短", "年度框架合同，涉及付款条款", None])
+        )
+
+    with pytest.raises(ValueError, match=r"\[1\]"):
+        Document.from_batch(
+            _frame(uploader_id=["a@example.com", "not-an-email", "c@example.com"])
+        )
+
+
+def test_from_batch_fills_missing_values_with_defaults():
+    """NaN/None 不覆盖有默认值的字段"""
+    docs = Document.from_batch(
+        _frame(
+            tags=[["contract"], None, np.nan],
+            related_doc_ids=[None, ["d0"], None],
+            parsed_text=["正文", None, np.nan],
+            expiry_date=[pd.NaT, CREATED_AT, None],
+        )
+    )
+
+    assert [doc.metadata.tags for doc in docs] == [["contract"], [], []]
+    assert [doc.metadata.related_doc_ids for doc in docs] == [[], ["d0"], []]
+    assert [doc.parsed_text for doc in docs] == ["正文", None, None]
+    assert [doc.metadata.expiry_date for doc in docs] == [None, CREATED_AT, None]
+    assert all(doc.version == 1 for doc in docs)
+
+
+def test_msgpack_round_trip():
+    """msgpack 往返保留时间 (微秒精度)、实体、向量和元数据"""
+    metadata = DocumentMetadata(
+        uploader_id="a@example.com",
+        upload_time=datetime(2024, 3, 5, 8, 15, 30, 123456),
+        department="legal",
+        business_context="年度框架合同，涉及付款条款",
+        tags=["contract"],
+        related_doc_ids=["d9"],
+        expiry_date=datetime(2025, 3, 5, 0, 0, 0, 1),
+    )
+    metadata.add_custom("owner", "张三")
+    doc = Document(
+        id="d1",
+        file_path="a.pdf",
+        content_type=DocumentType.PDF,
+        metadata=metadata,
+        version=3,
+        created_at=datetime(2024, 3, 5, 8, 15, 31),
+        updated_at=datetime(2024, 3, 6, 9, 0, 0, 999999),
+        ai_summary="付款条款摘要",
+        ai_risk_score=0.25,
+        parsed_text="甲方应于每季度末付款",
+        extracted_entities=[
+            Entity(EntityType.ORGANIZATION, "甲方", 0.9, "d1", "甲方应于"),
+            Entity(EntityType.DATE, "每季度末", 0.75, "d1"),
+        ],
+        embeddings=[3.0, 4.0, 0.0],
+    )
+
+    restored = Document.from_msgpack(doc.to_msgpack(), content_loader=lambda: b"raw")
+
+    assert restored.id == doc.id
+    assert restored.content_type is DocumentType.PDF
+    assert restored.metadata == doc.metadata
+    assert restored.metadata.custom_fields == {"owner": "张三"}
+    for name in ("version", "created_at", "updated_at", "ai_summary", "parsed_text"):
+        assert getattr(restored, name) == getattr(doc, name), name
+    assert restored.ai_risk_score == doc.ai_risk_score
+    assert [
+        (e.type, e.value, e.confidence, e.source_doc_id, e.context)
+        for e in restored.extracted_entities
+    ] == [
+        (e.type, e.value, e.confidence, e.source_doc_id, e.context)
+        for e in doc.extracted_entities
+    ]
+    assert restored.embeddings.dtype == np.float32
+    np.testing.assert_array_equal(restored.embeddings, doc.embeddings)
+    np.testing.assert_allclose(restored.embeddings, [0.6, 0.8, 0.0], rtol=1e-6)
+    np.testing.assert_array_equal(restored.embeddings_int8, doc.embeddings_int8)
+    assert restored.raw_content == b"raw"